@@ -1,8 +1,32 @@
+import functools
+import hashlib
+import os
+import runpy
+import uuid
 import streamlit as st
-from streamlit_gsheets import GSheetsConnection
 import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta, date
+from marketing_core import (ARCHIVE_WORKSHEETS, CAMPAIGN_STATES, DERIVE, FALLBACKS, MEMBER_ROLES, PARSERS,
+                            ROW_LIMIT, SOP_STEPS, TASK_STATUSES, WEEKDAY_MAP, WORKSHEETS, IdAllocator,
+                            MeteredStorage, Metrics, SearchIndex, SheetRefresher, Workload, WriteQueue,
+                            active_section, archive, cache_stats, compute_kpi, concat_frames, daily_counts,
+                            default_owners, executing, gantt_figure, get_sop_status, loaders, make_storage, max_id,
+                            occurrences, patch_frame, profiled, read_archive, routine_on, routine_section,
+                            soon_section, sop_bar_color, sop_html, sop_task_rows, timeline_figure, urgent_section)
+from marketing_core.export import FORMATS, ExportCache, iter_export, iter_ics
+from marketing_core.ratelimit import FakeQuotaBackend, RateLimitedStorage
+
+# 共用快照的 DataFrame 各 session 直接共讀，開啟 copy-on-write 讓篩選結果不必複製、也不會改到原表
+pd.set_option("mode.copy_on_write", True)
+
+# 管理員要求 cProfile 分析時：在這次重跑裡、同一個執行緒的 with 區塊內把整個腳本再執行一次，
+# 被 st.stop / st.rerun 中斷也一定會停止分析；結束後重跑一次讓後台顯示結果
+if st.session_state.pop("profile_next", False):
+    def keep_profile(text):
+        st.session_state.last_profile = text
+    with profiled(keep_profile):
+        runpy.run_path(__file__, run_name="__main__")
+    st.rerun()
 
 # ─────────────────────────────────────────
 # 1. 頁面設定
@@ -16,10 +40,39 @@ st.set_page_config(
 ADMIN_PASSWORD = "888"
 SHEET_ID       = "1DWKxP5UU0em42PweKet2971BamOnNCLpvDj6rAHh3Mo"
 SHEET_URL      = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/edit"
-WEEKDAY_MAP    = {0:"每週一",1:"每週二",2:"每週三",3:"每週四",4:"每週五",5:"每週六",6:"每週日"}
-SOP_STEPS      = ["企畫撰寫","素材製作","文案審核","排程上線","成效回報"]
-STATUS_DONE    = ["已核准"]
-STATUS_WIP     = ["進行中","待審核","需修改"]
+# 背景更新間隔（秒）與隨機提前比例
+REFRESH_INTERVAL = {"Marketing_Schedule": 600, "Campaign_Tasks": 300, "Team_Members": 1800}
+REFRESH_JITTER   = 0.1
+# Google Sheets API 每分鐘讀 / 寫請求配額（每位使用者），超過時先排隊等待
+SHEETS_READS_PER_MIN  = 60
+SHEETS_WRITES_PER_MIN = 60
+STORAGE_SPEC = os.environ.get("MARKETING_STORAGE", "gsheets")
+# App 自己的資料目錄（預設 ~/.local/state/money-marketing-room），只有執行 App 的使用者可存取
+DATA_DIR = os.environ.get("MARKETING_DATA_DIR") or os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"), "money-marketing-room")
+# 最後一次成功讀取的資料存放處：重新啟動後讀不到試算表時先用這份
+LAST_GOOD_DIR = os.environ.get("MARKETING_LAST_GOOD_DIR") or os.path.join(
+    DATA_DIR, "last-good-" + hashlib.md5(STORAGE_SPEC.encode()).hexdigest()[:8])
+# 延遲寫入：狀態更新累積多久送出一批（秒）
+WRITE_FLUSH_INTERVAL = 0.3
+# SOP 任務追蹤每頁顯示的活動數
+SOP_PAGE_SIZES   = [5, 10, 20, 50]
+SOP_PAGE_DEFAULT = 10
+# 情報室圖表快取的組合數（資料版本 × 區間 × 版面）
+FIGURE_CACHE_SIZE = 32
+FIGURE_LANES      = {"自動": None, "活動": "活動名稱", "負責人": "負責人", "刊登平台": "刊登平台"}
+# 發文日曆：超過此數量時每天只顯示一則總數
+CALENDAR_EVENT_LIMIT = 300
+# 結束超過幾天的活動可以封存；封存資料的快取秒數
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_TTL        = 600
+# 效能監測保留的重跑紀錄數
+METRICS_KEEP = 500
+# 搜尋最多列出的活動數
+SEARCH_LIMIT = 100
+# 匯出檔保留的資料版本數（每種檔案）
+EXPORT_KEEP = 2
+SHEET_LABELS     = {"Marketing_Schedule": "行程", "Campaign_Tasks": "任務", "Team_Members": "成員"}
 
 # ─────────────────────────────────────────
 # 2. CSS
@@ -55,53 +108,149 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ─────────────────────────────────────────
+# 效能量測：每次重跑各階段耗時（perf.lap），管理員後台可查看
+# ─────────────────────────────────────────
+@st.cache_resource
+def get_metrics():
+    return Metrics(METRICS_KEEP)
+
+# 上一次重跑被 st.stop / st.rerun 中斷時沒有走到結尾，在這裡補上結束
+if "perf" in st.session_state:
+    st.session_state.perf.finish()
+perf = st.session_state.perf = get_metrics().start(page=None)
+
 # ─────────────────────────────────────────
 # 3. 讀取資料
 # ─────────────────────────────────────────
-@st.cache_data(ttl=600)
-def load_data():
-    conn = st.connection("gsheets", type=GSheetsConnection)
-
-    # Marketing_Schedule
-    df = conn.read(worksheet="Marketing_Schedule").dropna(how="all")
-    df['開始日期'] = pd.to_datetime(df['開始日期'], errors='coerce')
-    df['結束日期'] = pd.to_datetime(df['結束日期'], errors='coerce')
-    for col in ['重複星期','週期模式','活動狀態','類型','活動名稱','相關連結','負責人','文案重點','刊登平台','呈現形式']:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().replace(['nan','NaN'], '')
-    if '活動狀態' not in df.columns:
-        df['活動狀態'] = "執行中"
+@st.cache_resource
+def get_sheets():
+    """依環境變數 MARKETING_STORAGE 建立儲存後端（預設 Google Sheets），外面包一層限速、重試與讀取合併。
+    設定 MARKETING_FAKE_QUOTA=每分鐘次數 時改接本機假配額（超過即回 429），用來測試配額用盡的情況"""
+    store = make_storage(STORAGE_SPEC)
+    if os.environ.get("MARKETING_FAKE_QUOTA"):
+        store = FakeQuotaBackend(store, int(os.environ["MARKETING_FAKE_QUOTA"]))
+    return RateLimitedStorage(store, SHEETS_READS_PER_MIN, SHEETS_WRITES_PER_MIN)
+
+@st.cache_resource
+def get_storage():
+    """所有使用者共用的儲存後端；讀寫都計入效能監測"""
+    return MeteredStorage(get_sheets(), get_metrics())
+
+# 各工作表分開載入，由 SheetRefresher 在背景定期更新，結果放在所有使用者共用的唯讀 Snapshot；
+# 寫入成功後把寫入的列直接套用到快照產生新版本，不必重新讀取整張表。
+# 讀取一律 ttl=0 略過連線層的快取，讓 refresher 成為唯一的快取層；解析規則在 marketing_core.load
+@st.cache_resource
+def get_refresher():
+    """所有使用者共用的背景更新器，持有目前版本的 Snapshot"""
+    return SheetRefresher(loaders(get_storage()), REFRESH_INTERVAL, REFRESH_JITTER,
+                          fallbacks=FALLBACKS, derive=DERIVE, cache_dir=LAST_GOOD_DIR).start()
+
+def invalidate(*worksheets):
+    """立即重新讀取指定工作表（不指定則全部）並替換共用資料"""
+    get_refresher().refresh(*worksheets)
+
+@st.cache_resource(ttl=ARCHIVE_TTL)
+def load_archive(worksheet):
+    """封存的冷資料（解析後），只在需要時讀取；還沒封存過時為 None"""
+    raw = read_archive(get_storage(), worksheet)
+    return None if raw is None else PARSERS[worksheet](raw)
+
+@st.cache_resource
+def get_id_allocator():
+    """任務ID / 成員ID 分配器；設定 MARKETING_ID_STATE 可跨程序同步。
+    每次保留編號前以 ttl=0 向後端重讀該表，涵蓋快照更新間隔內直接在試算表或由其他程序新增的列；
+    讀不到就不分配（不以可能過時的快照或空表代替）。任務ID 的下限也要算入封存的任務，避免重複使用已封存的編號"""
+    def floor(worksheet, col, prefix):
+        def high():
+            try:
+                fresh = get_storage().read_worksheet(worksheet, ttl=0)
+            except Exception as e:
+                raise RuntimeError(f"{SHEET_LABELS[worksheet]}目前讀不到最新資料，暫時無法產生新編號：{e}") from e
+            cached = get_refresher().snapshot.memo(("max_id", prefix),
+                                                   lambda s: max_id(s.frames[worksheet][col], prefix))
+            return max(max_id(fresh[col], prefix) if col in fresh.columns else 0, cached)
+        return high
+    def archived_tasks():
+        cold = load_archive("Campaign_Tasks")
+        return 0 if cold is None else max_id(cold['任務ID'], "T")
+    hot_tasks = floor("Campaign_Tasks", "任務ID", "T")
+    return IdAllocator({"T": lambda: max(hot_tasks(), archived_tasks()),
+                        "M": floor("Team_Members", "成員ID", "M")},
+                       state_path=os.environ.get("MARKETING_ID_STATE"))
+
+def apply_rows(worksheet, rows, key=None):
+    """把剛寫入後端的列套用到共用快照（copy-on-write 產生新版本）：
+    沒有 key 時視為新增（先經過該表的解析），有 key 時依鍵值覆寫對應欄位"""
+    if key is None:
+        new = PARSERS[worksheet](rows.copy())
+        get_refresher().apply(worksheet, lambda cur: concat_frames(cur, new))
     else:
-        df['活動狀態'] = df['活動狀態'].replace('', '企畫中')
-
-    # Campaign_Tasks
-    try:
-        tasks = conn.read(worksheet="Campaign_Tasks").dropna(how="all")
-        for col in ['任務ID','活動名稱','SOP步驟','任務說明','負責人','審核狀態','備註']:
-            if col in tasks.columns:
-                tasks[col] = tasks[col].astype(str).str.strip().replace(['nan','NaN'], '')
-        tasks['預計完成日'] = pd.to_datetime(tasks.get('預計完成日'), errors='coerce')
-        tasks['實際完成日'] = pd.to_datetime(tasks.get('實際完成日'), errors='coerce')
-    except Exception:
-        tasks = pd.DataFrame(columns=['任務ID','活動名稱','SOP步驟','任務說明','負責人','審核狀態','預計完成日','實際完成日','備註'])
-
-    # Team_Members
-    try:
-        members = conn.read(worksheet="Team_Members").dropna(how="all")
-        for col in ['成員ID','姓名','職稱','負責範疇','狀態']:
-            if col in members.columns:
-                members[col] = members[col].astype(str).str.strip().replace(['nan','NaN'], '')
-        members = members[members['狀態'] == '在職']
-    except Exception:
-        members = pd.DataFrame(columns=['成員ID','姓名','職稱','負責範疇','狀態'])
-
-    return df, tasks, members
+        get_refresher().apply(worksheet, lambda cur: patch_frame(cur, key, rows))
+
+@st.cache_resource
+def get_write_queue():
+    """所有使用者共用的延遲寫入佇列：狀態更新先套用到快照，背景每 WRITE_FLUSH_INTERVAL 秒整批寫回"""
+    refresher = get_refresher()
+    def server(worksheet):
+        return refresher.fetched.get(worksheet), refresher.loaded_at(worksheet)
+    def revert(c):   # 被別人搶先改過的欄位：畫面改回試算表上的值
+        apply_rows(c["worksheet"], pd.DataFrame([{**c["key"], c["column"]: c["server"]}]), list(c["key"]))
+    queue = WriteQueue(get_storage(), WRITE_FLUSH_INTERVAL, server=server,
+                       on_flushed=refresher.touch, on_conflict=revert)
+    refresher.overlay = queue.overlay   # 背景重讀時保留還沒寫回的修改
+    return queue.start()
+
+@st.cache_resource
+def get_export_cache():
+    """匯出檔依資料版本存在暫存目錄，同一版本重複下載不再產生"""
+    return ExportCache(keep=EXPORT_KEEP)
+
+def export_data(version, name, chunks):
+    """download_button 的延遲產生：按下下載時才取（或逐段寫出）這個版本的匯出檔，
+    交給 download_button 的是開啟的檔案而不是整份 bytes"""
+    return lambda: open(get_export_cache().path(version, name, chunks), "rb")
+
+@st.cache_resource
+def get_search_index():
+    """所有使用者共用的全文索引，跟著快照版本增量同步"""
+    return SearchIndex()
+
+# 圖表依（資料版本, 區間, 版面, 分列）快取，同一份資料不重建；_frame 不參與雜湊
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE)
+def timeline_chart(version, start, end, mobile_mode, lane, _frame):
+    get_metrics().count("figure_cache_miss")
+    return timeline_figure(_frame, start, end, mobile_mode, lane)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE)
+def gantt_chart(version, today, mobile_mode, lane, _frame):
+    get_metrics().count("figure_cache_miss")
+    return gantt_figure(_frame, today, mobile_mode, lane)
 
 try:
-    df, tasks_df, members_df = load_data()
+    get_refresher().ensure_loaded()   # 第一次載入時三張表平行讀取；讀不到時改用最後一次成功的資料
 except Exception as e:
+    # 只有從來沒有成功讀取過、也沒有保存的資料時才會走到這裡
     st.error(f"資料讀取失敗：{e}")
     st.stop()
+snap       = get_refresher().snapshot   # 本次執行從頭到尾使用同一版本
+df         = snap.schedule
+tasks_df   = snap.tasks
+members_df = snap.memo("active_members", lambda s: s.members[s.members['狀態'] == '在職'])
+intervals  = snap.intervals
+sop_index  = snap.sop_index
+
+# 延遲寫入發生衝突時，通知提出修改的那位使用者
+writer_id = st.session_state.setdefault("writer_id", uuid.uuid4().hex)
+for c in get_write_queue().take_conflicts(writer_id):
+    label = "、".join(str(v) for v in c["key"].values())
+    st.warning(f"⚠️ {label} 的「{c['column']}」已被其他人改為「{c['server']}」，你的修改「{c['mine']}」未寫入")
+# 讀取失敗時頁面沿用最後一次成功的資料，在頁首標示資料時間
+if get_refresher().errors:
+    stale = "、".join(f"{SHEET_LABELS[ws]}（{get_refresher().loaded_at(ws):%m/%d %H:%M}）"
+                      for ws in WORKSHEETS if ws in get_refresher().errors)
+    st.warning(f"⚠️ 暫時無法讀取試算表，{stale} 顯示的是最後一次成功讀取的資料，系統會自動重試。")
+perf.lap("load")
 
 # ─────────────────────────────────────────
 # 4. 輔助函式
@@ -110,92 +259,88 @@ def member_names(members_df, include_empty=True):
     names = members_df['姓名'].tolist() if not members_df.empty else []
     return (["（未指定）"] + names) if include_empty else names
 
-def get_sop_status(campaign_name, tasks_df):
-    sub = tasks_df[tasks_df['活動名稱'] == campaign_name]
-    result = {}
-    for step in SOP_STEPS:
-        row = sub[sub['SOP步驟'] == step]
-        result[step] = {"status": row.iloc[0]['審核狀態'], "owner": row.iloc[0]['負責人']} if not row.empty else {"status":"—","owner":""}
-    return result
-
-def sop_progress_pct(sop_dict):
-    return int(sum(1 for v in sop_dict.values() if v["status"] in STATUS_DONE) / len(SOP_STEPS) * 100)
-
-def sop_bar_color(pct):
-    return "#2ecc71" if pct >= 80 else "#3498db" if pct >= 40 else "#f39c12"
-
-def sop_html(sop_dict):
-    html = ""
-    for step in SOP_STEPS:
-        info = sop_dict.get(step, {"status":"—","owner":""})
-        s, o = info["status"], info["owner"]
-        if s in STATUS_DONE:   cls, icon = "sop-done",  "✓"
-        elif s == "需修改":     cls, icon = "sop-block", "✗"
-        elif s in STATUS_WIP:  cls, icon = "sop-wip",   "⋯"
-        else:                  cls, icon = "sop-todo",  "○"
-        html += f'<div class="sop-step {cls}">{icon} {step}<span class="sop-owner">{o or "—"}</span></div>'
-    return f'<div class="sop-row">{html}</div>'
+# 表格中的審核狀態以圖示標示（整欄 map，取代逐格套用樣式的 Styler.applymap）
+STATUS_LABEL = {"已核准":"🟢 已核准","進行中":"🔵 進行中","待審核":"🟡 待審核",
+                "需修改":"🔴 需修改","待執行":"⚪ 待執行"}
 
 def avatar_color(name):
     colors = ["#3498db","#2ecc71","#9b59b6","#e67e22","#e74c3c","#1abc9c","#f39c12","#2980b9"]
     return colors[sum(ord(c) for c in name) % len(colors)]
 
-def compute_kpi(df, today):
-    exec_df = df[df['活動狀態'].str.contains("執行中", na=False)]
-    plan_df = df[df['活動狀態'].str.contains("企畫中", na=False)]
-    active  = exec_df[(exec_df['開始日期']<=today) & (exec_df['結束日期']>=today)]
-    in_7    = exec_df[(exec_df['結束日期']>=today) & (exec_df['結束日期']<=today+pd.Timedelta(days=7))]
-    in_3    = exec_df[(exec_df['結束日期']>=today) & (exec_df['結束日期']<=today+pd.Timedelta(days=3))]
-    wd      = WEEKDAY_MAP[today.dayofweek]
-    mask_r  = (exec_df['類型']=='常態') & (exec_df['開始日期']<=today) & (exec_df['結束日期']>=today)
-    routine = exec_df[mask_r]
-    if not routine.empty:
-        routine = routine[routine.apply(lambda x: x['週期模式']=='每日' or (wd in str(x['重複星期'])), axis=1)]
-    return dict(active_count=len(active), expire_7=len(in_7), expire_3=len(in_3),
-                today_routine=len(routine), plan_count=len(plan_df),
-                in_7_df=in_7, in_3_df=in_3, active_df=active, routine_df=routine, weekday_str=wd)
-
-def next_task_id(tasks_df):
-    """產生下一個任務 ID，格式 T001"""
-    if tasks_df.empty or '任務ID' not in tasks_df.columns:
-        return "T001"
-    existing = tasks_df['任務ID'].astype(str).str.extract(r'T(\d+)')[0].dropna().astype(int)
-    return f"T{(existing.max() + 1):03d}" if not existing.empty else "T001"
-
-def write_sop_tasks(campaign_name, sop_assignments, tasks_df, start_date):
-    """將 SOP 分配寫入 Campaign_Tasks，回傳新的 DataFrame"""
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    raw  = conn.read(worksheet="Campaign_Tasks", ttl=0).dropna(how="all")
-
-    # 取得目前最大 ID
-    if raw.empty or '任務ID' not in raw.columns:
-        max_id = 0
-    else:
-        ids = raw['任務ID'].astype(str).str.extract(r'T(\d+)')[0].dropna().astype(int)
-        max_id = ids.max() if not ids.empty else 0
-
-    new_rows = []
-    for i, step in enumerate(SOP_STEPS):
-        owner = sop_assignments.get(step, "（未指定）")
-        if owner == "（未指定）":
-            owner = ""
-        due_date = (pd.Timestamp(start_date) + pd.Timedelta(days=i*2)).strftime("%Y-%m-%d")
-        new_rows.append({
-            "任務ID":    f"T{(max_id + i + 1):03d}",
-            "活動名稱":  campaign_name,
-            "SOP步驟":   step,
-            "任務說明":  "",
-            "負責人":    owner,
-            "審核狀態":  "待執行",
-            "預計完成日": due_date,
-            "實際完成日": "",
-            "備註":      "",
-        })
-
-    new_df  = pd.DataFrame(new_rows)
-    updated = pd.concat([raw, new_df], ignore_index=True)
-    conn.update(worksheet="Campaign_Tasks", data=updated)
-    return updated
+def calendar_campaigns(d, with_plan=False):
+    """發文日曆要展開的活動：執行中（可選擇加上企畫中）"""
+    return d[d['活動狀態'].str.contains("執行中|企畫中" if with_plan else "執行中", na=False)]
+
+def write_sop_tasks(campaign_name, sop_assignments, start_date):
+    """將 SOP 分配寫入 Campaign_Tasks，回傳新增的子任務"""
+    new_df = sop_task_rows(campaign_name, sop_assignments, start_date,
+                           get_id_allocator().reserve("T", len(SOP_STEPS)))
+    get_storage().append_rows("Campaign_Tasks", new_df)
+    return new_df
+
+# 批次編輯可修改的任務欄位
+TASK_EDIT_COLS = ['負責人','審核狀態','預計完成日','實際完成日','備註']
+
+def changed_cells(edited, base, cols):
+    """edited 與 base（同索引）逐格比較，cols 中值不同的儲存格為 True"""
+    a, b = edited[cols].astype(object), base[cols].astype(object)
+    return (a != b) & ~(a.isna() & b.isna())
+
+def changed_tasks(edited, base, cols):
+    """edited 與 base（同索引）在 cols 中有任一欄不同的列"""
+    return changed_cells(edited, base, cols).any(axis=1)
+
+def queue_task_updates(rows, base):
+    """多筆任務修改一次排入延遲寫入並套用到快照（只產生一個新版本）；只送出、只覆寫值有變的儲存格。
+    rows / base 同索引，含任務ID、活動名稱、SOP步驟與要改的欄位，base 為修改前的值"""
+    cols   = [c for c in TASK_EDIT_COLS if c in rows.columns]
+    diff   = changed_cells(rows, base.loc[rows.index], cols)
+    has_id = rows['任務ID'].fillna('').astype(str).str.strip() != ''
+    patches = []
+    for key, part in (("任務ID", rows[has_id]), (["活動名稱","SOP步驟"], rows[~has_id])):
+        keys   = [key] if isinstance(key, str) else key
+        groups = {}   # {改到的欄位: [列索引]}，同一組一起套用到快照
+        for i, r in part.iterrows():
+            changed = [c for c in cols if diff.at[i, c]]
+            if not changed: continue
+            get_write_queue().update("Campaign_Tasks", key, r[keys + changed].to_dict(),
+                                     base=base.loc[i, changed].to_dict(), owner=writer_id)
+            groups.setdefault(tuple(changed), []).append(i)
+        patches += [(key, part.loc[idx, keys + list(changed)]) for changed, idx in groups.items()]
+    get_refresher().apply("Campaign_Tasks",
+                          lambda cur: functools.reduce(lambda f, kp: patch_frame(f, *kp), patches, cur))
+
+def parse_task_csv(file, tasks_df):
+    """讀取任務更新 CSV：以任務ID 對應，空白儲存格代表不變。
+    回傳 (修改後的列, 修改前的列, 錯誤訊息清單)"""
+    raw = pd.read_csv(file, dtype=str).fillna('')
+    raw.columns = raw.columns.str.strip()
+    if '任務ID' not in raw.columns:
+        return None, None, ["CSV 缺少必要欄位：任務ID"]
+    cols = [c for c in TASK_EDIT_COLS if c in raw.columns]
+    if not cols:
+        return None, None, [f"CSV 至少需要下列其中一欄：{'、'.join(TASK_EDIT_COLS)}"]
+    raw  = raw.apply(lambda c: c.str.strip())
+    pos  = pd.Series(tasks_df.index, index=tasks_df['任務ID'].astype(str).str.strip())
+    pos  = pos[~pos.index.duplicated()]
+    errors = [f"找不到任務ID：{t}" for t in raw.loc[~raw['任務ID'].isin(pos.index), '任務ID']]
+    raw  = raw[raw['任務ID'].isin(pos.index)].drop_duplicates('任務ID', keep='last')
+    if '審核狀態' in cols:
+        bad = raw.loc[(raw['審核狀態'] != '') & ~raw['審核狀態'].isin(TASK_STATUSES), ['任務ID','審核狀態']]
+        errors += [f"{t}：未知的審核狀態「{v}」" for t, v in bad.itertuples(index=False)]
+    base  = tasks_df.loc[pos[raw['任務ID']].to_numpy()]
+    rows  = base.copy()
+    for c in cols:
+        given = raw[c].to_numpy() != ''
+        vals  = raw[c].to_numpy()
+        if c in ('預計完成日','實際完成日'):
+            vals = pd.to_datetime(pd.Series(vals), errors='coerce').astype(object).to_numpy()
+            errors += [f"{t}：無法解析的{c}「{v}」" for t, v, ok in
+                       zip(raw['任務ID'], raw[c], pd.notna(vals)) if v and not ok]
+        rows[c] = rows[c].astype(object)
+        rows.loc[given, c] = vals[given]
+    rows = rows[changed_tasks(rows, base, cols)]
+    return rows, base.loc[rows.index], errors
 
 # ─────────────────────────────────────────
 # 5. 側邊欄
@@ -206,30 +351,73 @@ with st.sidebar:
     st.subheader("⚙️ 顯示設定")
     mobile_mode = st.checkbox("📱 手機版面優化", value=False)
     st.divider()
+    refresh_ws = st.selectbox("刷新範圍", ["全部工作表"] + list(WORKSHEETS))
     if st.button("🔄 強制刷新資料"):
-        st.cache_data.clear()
+        try:
+            if refresh_ws == "全部工作表": invalidate()
+            else: invalidate(refresh_ws)
+        except Exception:
+            pass   # 讀不到時沿用舊資料，頁首會顯示提示
         st.rerun()
+    st.caption("資料時間：" + " ｜ ".join(
+        f"{SHEET_LABELS[ws]} {get_refresher().loaded_at(ws):%H:%M:%S}"
+        f"（{get_refresher().timings.get(ws, 0):.1f}s）" for ws in WORKSHEETS))
+    if get_write_queue().pending():
+        st.caption(f"⏳ {get_write_queue().pending()} 筆修改同步中")
+    if get_write_queue().last_error:
+        st.warning(f"寫回試算表失敗，稍後自動重試：{get_write_queue().last_error}")
     st.divider()
-    page = st.radio("功能選單：", [
+    pages = [
         "🏠 指揮中心",
         "📋 SOP 任務追蹤",
         "➕ 活動輸入 (新增)",
         "👥 成員管理",
         "📊 活動進程 (情報室)",
-    ], index=0)
+    ]
+    page = st.radio("功能選單：", pages, index=0)
     st.divider()
     st.subheader("🔐 管理員後台")
     pwd = st.text_input("輸入密碼開啟試算表", type="password", placeholder="請輸入密碼...")
     if pwd == ADMIN_PASSWORD:
         st.success("身分驗證成功！")
         st.link_button("📝 前往 Google Sheets", SHEET_URL)
+        if st.button("🗄️ 封存已結束活動", help=f"結束超過 {ARCHIVE_AFTER_DAYS} 天的活動與其已完成任務移到封存工作表"):
+            try:
+                get_write_queue().flush()   # 改寫工作表前先送出待寫入的修改
+                moved = archive(get_storage(), pd.Timestamp.now().normalize() - pd.Timedelta(days=ARCHIVE_AFTER_DAYS))
+                load_archive.clear()
+                invalidate(*ARCHIVE_WORKSHEETS)
+                st.toast(f"✅ 已封存 {moved['Marketing_Schedule']} 個活動、{moved['Campaign_Tasks']} 筆任務")
+                st.rerun()
+            except Exception as e:
+                st.error(f"封存失敗：{e}")
+
+        with st.expander("⏱️ 效能監測"):
+            n_runs = st.slider("統計最近幾次重跑", 10, METRICS_KEEP, 50, step=10)
+            scope  = st.selectbox("頁面", ["全部頁面"] + pages, key="perf_scope")
+            st.dataframe(get_metrics().summary(n_runs, None if scope == "全部頁面" else scope),
+                         hide_index=True, use_container_width=True)
+            totals = {**get_metrics().totals(), **snap.stats, **cache_stats(),
+                      **{f"sheets_{k}": v for k, v in get_sheets().stats.items()}}
+            st.dataframe(pd.Series(totals, name="累計", dtype="int64").rename_axis("計數器"), use_container_width=True)
+            st.download_button("⬇️ 匯出 JSON Lines", get_metrics().to_jsonl(), file_name="marketing_metrics.jsonl",
+                               mime="application/jsonl")
+            if st.button("🔬 下一次重跑以 cProfile 分析"):
+                st.session_state.profile_next = True
+                st.rerun()
+            if st.session_state.get("last_profile"):
+                st.code(st.session_state.last_profile)
+
+perf.page = page
+perf.lap("sidebar")
 
 # ─────────────────────────────────────────
 # 頁面：指揮中心
 # ─────────────────────────────────────────
 if page == "🏠 指揮中心":
     today = pd.Timestamp.now().normalize()
-    kpi   = compute_kpi(df, today)
+    kpi   = compute_kpi(df, today, intervals)
+    perf.lap("compute_kpi")
     st.title("🏠 指揮中心")
     st.markdown(f"📅 今天是 **{today.strftime('%Y-%m-%d')} ({kpi['weekday_str']})**")
 
@@ -246,83 +434,48 @@ if page == "🏠 指揮中心":
                      f'<div class="kpi-sub">{sub}</div></div>', unsafe_allow_html=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
+    perf.lap("render.kpi")
     left, right = st.columns(2, gap="large")
 
     with left:
         if not kpi["in_3_df"].empty:
             st.markdown("### 🔴 緊急！3 天內到期")
-            for _, row in kpi["in_3_df"].iterrows():
-                d = (row['結束日期']-today).days
-                st.markdown(f'<div class="campaign-card card-urgent"><b>{row["活動名稱"]}</b>'
-                            f'<span class="badge badge-red">剩 {d} 天</span><br>'
-                            f'<small>📢 {row["刊登平台"]} ｜ 負責人：{row.get("負責人","—")}</small></div>',
-                            unsafe_allow_html=True)
+            st.markdown(urgent_section(kpi["in_3_df"], today), unsafe_allow_html=True)
         else:
             st.success("✅ 近 3 天無到期活動")
 
         st.markdown("### 🟡 7 天內即將到期")
         if not kpi["in_7_df"].empty:
-            for _, row in kpi["in_7_df"].iterrows():
-                d  = (row['結束日期']-today).days
-                bc = "badge-red" if d<=3 else "badge-amber"
-                st.markdown(f'<div class="campaign-card card-plan"><b>{row["活動名稱"]}</b>'
-                            f'<span class="badge {bc}">剩 {d} 天</span><br>'
-                            f'<small>結束：{row["結束日期"].strftime("%Y-%m-%d")} ｜ 負責人：{row.get("負責人","—")}</small></div>',
-                            unsafe_allow_html=True)
+            st.markdown(soon_section(kpi["in_7_df"], today), unsafe_allow_html=True)
         else:
             st.info("近 7 天沒有活動到期")
 
     with right:
         st.markdown("### ✅ 今日常態任務")
         if not kpi["routine_df"].empty:
-            for _, row in kpi["routine_df"].iterrows():
-                sop  = get_sop_status(row['活動名稱'], tasks_df)
-                pct  = sop_progress_pct(sop)
-                bc   = sop_bar_color(pct)
-                lnk  = row.get('相關連結','')
-                lhtml= f'<a href="{lnk}" target="_blank" style="font-size:12px;">🔗 前往素材</a>' if str(lnk).startswith("http") else ""
-                st.markdown(
-                    f'<div class="campaign-card card-normal"><b>{row["活動名稱"]}</b>'
-                    f'<span class="badge badge-blue">{row["週期模式"]}</span><br>'
-                    f'<small>📢 {row["刊登平台"]}</small>'
-                    f'<div class="progress-wrap"><div class="progress-bar" style="width:{pct}%;background:{bc}"></div></div>'
-                    f'<small style="color:#888">SOP 完成度 {pct}%</small>'
-                    f'{sop_html(sop)}{lhtml}</div>', unsafe_allow_html=True)
+            st.markdown(routine_section(kpi["routine_df"], sop_index), unsafe_allow_html=True)
         else:
             st.info("今日無常態任務")
 
         st.markdown("### 🚀 進行中行銷案")
         active_c = kpi["active_df"][kpi["active_df"]['類型']=='行銷案']
         if not active_c.empty:
-            for _, row in active_c.iterrows():
-                dur  = max((row['結束日期']-row['開始日期']).days,1)
-                tpct = min(int((today-row['開始日期']).days/dur*100),100)
-                dl   = (row['結束日期']-today).days
-                sop  = get_sop_status(row['活動名稱'], tasks_df)
-                spct = sop_progress_pct(sop)
-                bc   = "#e74c3c" if dl<=3 else "#f39c12" if dl<=7 else "#2ecc71"
-                lnk  = row.get('相關連結','')
-                lhtml= f'<a href="{lnk}" target="_blank" style="font-size:12px;">🔗 查看企劃</a>' if str(lnk).startswith("http") else ""
-                st.markdown(
-                    f'<div class="campaign-card card-normal"><b>{row["活動名稱"]}</b>'
-                    f'<span class="badge badge-red" style="float:right">剩 {dl} 天</span><br>'
-                    f'<small>時程進度 {tpct}%</small>'
-                    f'<div class="progress-wrap"><div class="progress-bar" style="width:{tpct}%;background:{bc}"></div></div>'
-                    f'<small>📢 {row["刊登平台"]} ｜ 負責人：{row.get("負責人","—")}</small><br>'
-                    f'<small style="color:#888">SOP 完成度 {spct}%</small>'
-                    f'{sop_html(sop)}{lhtml}</div>', unsafe_allow_html=True)
+            st.markdown(active_section(active_c, today, sop_index), unsafe_allow_html=True)
         else:
             st.info("目前無進行中的大型行銷案")
 
+    perf.lap("render.cards")
     st.divider()
     st.markdown("### 🗂️ 全部活動狀態一覽")
     sc = df['活動狀態'].value_counts()
+    sc = sc[sc > 0]
     bm = {"執行中":"badge-green","企畫中":"badge-amber","已結束":"badge-gray"}
     st.markdown("".join(f'<span class="badge {bm.get(s,"badge-blue")}">{s} ({c})</span> ' for s,c in sc.items()), unsafe_allow_html=True)
     st.dataframe(df[['活動名稱','類型','活動狀態','開始日期','結束日期','負責人','刊登平台']],
         use_container_width=True, hide_index=True,
         column_config={"開始日期":st.column_config.DateColumn("開始",format="YYYY-MM-DD"),
                        "結束日期":st.column_config.DateColumn("結束",format="YYYY-MM-DD")})
+    perf.lap("render.table")
 
 # ─────────────────────────────────────────
 # 頁面：SOP 任務追蹤
@@ -338,67 +491,147 @@ elif page == "📋 SOP 任務追蹤":
 
     f1,f2,f3 = st.columns(3)
     sel_campaign = f1.selectbox("活動名稱", ["全部"]+sorted(tasks_df['活動名稱'].unique().tolist()))
-    sel_owner    = f2.selectbox("負責人",   ["全部"]+sorted(tasks_df['負責人'].replace('','—').unique().tolist()))
-    sel_status   = f3.selectbox("審核狀態", ["全部","待執行","進行中","待審核","已核准","需修改"])
+    sel_owner    = f2.selectbox("負責人",   ["全部"]+sorted({o or '—' for o in tasks_df['負責人'].unique()}))
+    sel_status   = f3.selectbox("審核狀態", ["全部"]+TASK_STATUSES)
 
-    filtered = tasks_df.copy()
+    filtered = tasks_df
     if sel_campaign != "全部": filtered = filtered[filtered['活動名稱']==sel_campaign]
-    if sel_owner    != "全部": filtered = filtered[filtered['負責人']   ==sel_owner]
+    if sel_owner    != "全部": filtered = filtered[filtered['負責人']   ==(sel_owner if sel_owner != '—' else '')]
     if sel_status   != "全部": filtered = filtered[filtered['審核狀態'] ==sel_status]
 
+    bulk_mode = st.toggle("🗂️ 批次編輯", help="一次修改多筆任務的狀態、負責人與日期，送出後只重新整理一次")
     st.divider()
-    sc_map = {"已核准":"background-color:#d4f5e2;color:#1a7a44","進行中":"background-color:#dbeafe;color:#1e40af",
-              "待審核":"background-color:#fff3cd;color:#856404","需修改":"background-color:#fde8e8;color:#b91c1c",
-              "待執行":"background-color:#e9ecef;color:#555"}
+    perf.lap("filter")
+
+    if bulk_mode:
+        owners = member_names(members_df, include_empty=False)
+        st.markdown(f"#### 🗂️ 篩選結果共 {len(filtered)} 筆任務")
+
+        with st.form("bulk_set"):
+            st.caption("套用到上方篩選出的全部任務；留空的項目不變")
+            b1,b2,b3 = st.columns(3)
+            set_status = b1.selectbox("審核狀態", ["（不變）"]+TASK_STATUSES)
+            set_owner  = b2.selectbox("負責人",   ["（不變）"]+owners)
+            set_due    = b3.date_input("預計完成日", value=None)
+            if st.form_submit_button(f"⚡ 套用到 {len(filtered)} 筆任務"):
+                rows = filtered.astype({c: object for c in TASK_EDIT_COLS})
+                if set_status != "（不變）": rows['審核狀態']   = set_status
+                if set_owner  != "（不變）": rows['負責人']     = set_owner
+                if set_due is not None:     rows['預計完成日'] = pd.Timestamp(set_due)
+                rows = rows[changed_tasks(rows, filtered, TASK_EDIT_COLS)]
+                if rows.empty:
+                    st.info("沒有需要變更的任務")
+                else:
+                    queue_task_updates(rows, filtered)
+                    st.toast(f"✅ 已更新 {len(rows)} 筆任務")
+                    st.rerun()
 
-    for campaign_name, group in filtered.groupby('活動名稱', sort=False):
-        sop  = get_sop_status(campaign_name, tasks_df)
-        pct  = sop_progress_pct(sop)
+        grid_cols = ['任務ID','活動名稱','SOP步驟'] + TASK_EDIT_COLS
+        grid      = filtered[grid_cols].astype({'負責人': object, '審核狀態': object})
+        edited    = st.data_editor(
+            grid, key="bulk_grid", hide_index=True, use_container_width=True, num_rows="fixed",
+            disabled=['任務ID','活動名稱','SOP步驟'],
+            column_config={
+                "負責人":    st.column_config.SelectboxColumn("負責人", options=[""]+owners),
+                "審核狀態":  st.column_config.SelectboxColumn("審核狀態", options=TASK_STATUSES, required=True),
+                "預計完成日": st.column_config.DateColumn("預計完成", format="MM-DD"),
+                "實際完成日": st.column_config.DateColumn("實際完成", format="MM-DD"),
+            })
+        changed = changed_tasks(edited, grid, TASK_EDIT_COLS)
+        if st.button(f"💾 儲存表格修改（{int(changed.sum())} 筆）", disabled=not changed.any()):
+            queue_task_updates(edited[changed], grid)
+            st.toast(f"✅ 已更新 {int(changed.sum())} 筆任務")
+            st.rerun()
+
+        with st.expander("📤 以 CSV 批次更新"):
+            st.caption("欄位：任務ID（必要）＋ 任一或多個 " + "、".join(TASK_EDIT_COLS) + "；空白儲存格代表不變")
+            csv_file = st.file_uploader("選擇 CSV 檔", type="csv", key="bulk_csv")
+            if csv_file is not None:
+                csv_rows, csv_base, csv_errors = parse_task_csv(csv_file, tasks_df)
+                for msg in csv_errors[:20]:
+                    st.error(msg)
+                if csv_rows is not None and not csv_errors:
+                    if csv_rows.empty:
+                        st.info("CSV 內容與目前資料相同，沒有需要變更的任務")
+                    else:
+                        st.dataframe(csv_rows[grid_cols], hide_index=True, use_container_width=True)
+                        if st.button(f"📥 套用 CSV（{len(csv_rows)} 筆）"):
+                            queue_task_updates(csv_rows, csv_base)
+                            st.toast(f"✅ 已從 CSV 更新 {len(csv_rows)} 筆任務")
+                            st.rerun()
+        st.divider()
+    if bulk_mode: perf.lap("render.bulk")
+
+    # 只組出目前頁面的活動；任務表與更新表單要等該活動展開才建立
+    names = [] if bulk_mode else filtered['活動名稱'].unique().tolist()
+    if names:
+        p1,p2,p3 = st.columns([1,1,2])
+        page_size = p1.selectbox("每頁活動數", SOP_PAGE_SIZES, index=SOP_PAGE_SIZES.index(SOP_PAGE_DEFAULT))
+        n_pages   = -(-len(names) // page_size)
+        page_no   = p2.selectbox("頁數", range(1, n_pages+1), format_func=lambda n: f"第 {n} / {n_pages} 頁")
+        p3.caption(f"共 {len(names)} 個活動、{len(filtered)} 筆任務")
+        names = names[(page_no-1)*page_size : page_no*page_size]
+
+    page_tasks = filtered[filtered['活動名稱'].isin(names)]
+    for campaign_name, group in page_tasks.groupby('活動名稱', sort=False):
+        sop  = get_sop_status(campaign_name, sop_index)
+        pct  = sop_index.pct.get(campaign_name, 0)
         bc   = sop_bar_color(pct)
-        hc1,hc2 = st.columns([3,1])
+        hc1,hc2,hc3 = st.columns([3,1,1])
         hc1.markdown(f"#### 📌 {campaign_name}")
         hc2.markdown(f"**SOP 完成度：{pct}%**")
+        opened = hc3.toggle("展開任務", value=sel_campaign != "全部", key=f"open_{campaign_name}")
         st.markdown(
             f'<div class="progress-wrap" style="height:10px;margin-bottom:6px">'
             f'<div class="progress-bar" style="width:{pct}%;background:{bc}"></div></div>'
             f'{sop_html(sop)}', unsafe_allow_html=True)
+        if not opened:
+            st.divider()
+            continue
 
         dcols = [c for c in ['SOP步驟','任務說明','負責人','審核狀態','預計完成日','實際完成日','備註'] if c in group.columns]
         st.dataframe(
-            group[dcols].style.applymap(lambda v: sc_map.get(v,""), subset=['審核狀態']),
+            group[dcols].assign(審核狀態=group['審核狀態'].map(STATUS_LABEL)),
             use_container_width=True, hide_index=True,
-            column_config={"預計完成日":st.column_config.DateColumn("預計完成",format="MM-DD"),
+            column_config={"審核狀態":st.column_config.TextColumn("審核狀態"),
+                           "預計完成日":st.column_config.DateColumn("預計完成",format="MM-DD"),
                            "實際完成日":st.column_config.DateColumn("實際完成",format="MM-DD")})
 
         with st.expander(f"✏️ 快速更新「{campaign_name}」子任務狀態"):
             u1,u2,u3 = st.columns(3)
             sel_step   = u1.selectbox("SOP 步驟", group['SOP步驟'].tolist(), key=f"step_{campaign_name}")
-            sel_new_st = u2.selectbox("新狀態", ["待執行","進行中","待審核","已核准","需修改"], key=f"st_{campaign_name}")
+            sel_new_st = u2.selectbox("新狀態", TASK_STATUSES, key=f"st_{campaign_name}")
             if u3.button("✅ 更新", key=f"btn_{campaign_name}"):
                 try:
-                    conn = st.connection("gsheets", type=GSheetsConnection)
-                    raw  = conn.read(worksheet="Campaign_Tasks", ttl=0).dropna(how="all")
-                    mask = (raw['活動名稱'].astype(str).str.strip()==campaign_name) & \
-                           (raw['SOP步驟'].astype(str).str.strip()==sel_step)
-                    raw.loc[mask,'審核狀態'] = sel_new_st
-                    conn.update(worksheet="Campaign_Tasks", data=raw)
-                    st.cache_data.clear()
+                    tid = group.loc[group['SOP步驟']==sel_step, '任務ID'].iloc[0] if '任務ID' in group.columns else ""
+                    if tid:
+                        key, patch = "任務ID", pd.DataFrame([{"任務ID": tid, "審核狀態": sel_new_st}])
+                    else:  # 舊資料沒有任務ID時以活動名稱＋步驟定位
+                        key, patch = ["活動名稱","SOP步驟"], pd.DataFrame([{
+                            "活動名稱": campaign_name, "SOP步驟": sel_step, "審核狀態": sel_new_st}])
+                    seen = group.loc[group['SOP步驟']==sel_step, '審核狀態'].iloc[0]
+                    get_write_queue().update("Campaign_Tasks", key, patch.iloc[0].to_dict(),
+                                             base={"審核狀態": seen}, owner=writer_id)
+                    apply_rows("Campaign_Tasks", patch, key)   # 先更新畫面，背景再寫回試算表
                     st.toast(f"✅ 已更新「{sel_step}」→ {sel_new_st}")
                     st.rerun()
                 except Exception as e:
                     st.error(f"更新失敗：{e}")
         st.divider()
 
+    perf.lap("render.campaigns")
     st.markdown("### 📊 狀態統計")
+    status_counts = tasks_df['審核狀態'].value_counts()
     sc1,sc2,sc3,sc4,sc5 = st.columns(5)
     for col,status,badge in [
         (sc1,"已核准","badge-green"),(sc2,"進行中","badge-blue"),
         (sc3,"待審核","badge-amber"),(sc4,"需修改","badge-red"),(sc5,"待執行","badge-gray")
     ]:
-        cnt = len(tasks_df[tasks_df['審核狀態']==status])
+        cnt = status_counts.get(status, 0)
         col.markdown(f'<div class="kpi-card"><div class="kpi-label"><span class="badge {badge}">{status}</span></div>'
                      f'<div class="kpi-number" style="font-size:28px">{cnt}</div>'
                      f'<div class="kpi-sub">個子任務</div></div>', unsafe_allow_html=True)
+    perf.lap("render.stats")
 
 # ─────────────────────────────────────────
 # 頁面：活動輸入
@@ -450,17 +683,11 @@ elif page == "➕ 活動輸入 (新增)":
         st.caption("若現在確定負責人，可在此指定；系統將自動建立子任務並寫入 Campaign_Tasks")
         sop_cols = st.columns(len(SOP_STEPS))
         sop_assignments = {}
+        step_owners     = snap.memo("default_owners", lambda s: default_owners(members_df))
         for i, step in enumerate(SOP_STEPS):
             # 根據成員負責範疇預設推薦
-            default_idx = 0
-            if not members_df.empty:
-                for _, m in members_df.iterrows():
-                    if step in str(m.get('負責範疇','')):
-                        try:
-                            default_idx = names.index(m['姓名'])
-                        except ValueError:
-                            pass
-                        break
+            owner       = step_owners.get(step)
+            default_idx = names.index(owner) if owner in names else 0
             sop_assignments[step] = sop_cols[i].selectbox(
                 step, names, index=default_idx, key=f"sop_{step}"
             )
@@ -488,22 +715,20 @@ elif page == "➕ 活動輸入 (新增)":
                 }])
                 try:
                     st.info("🔄 正在同步雲端最新資料...")
-                    conn = st.connection("gsheets", type=GSheetsConnection)
-
                     # 寫入 Marketing_Schedule
-                    cur = conn.read(worksheet="Marketing_Schedule", ttl=0).dropna(how="all")
-                    conn.update(worksheet="Marketing_Schedule", data=pd.concat([cur,new_row],ignore_index=True))
+                    get_storage().append_rows("Marketing_Schedule", new_row)
+                    apply_rows("Marketing_Schedule", new_row)
 
                     # 自動建立 SOP 子任務
                     if auto_create_tasks:
-                        write_sop_tasks(new_name, sop_assignments, tasks_df, new_start)
+                        apply_rows("Campaign_Tasks", write_sop_tasks(new_name, sop_assignments, new_start))
                         st.toast("✅ SOP 子任務已同步建立！")
 
                     st.toast(f"✅ 活動新增成功！狀態：{status_clean}")
-                    st.cache_data.clear()
                     st.success(f"「{new_name}」已寫入 Google Sheets，SOP 子任務已建立。")
                 except Exception as e:
                     st.error(f"寫入失敗：{e}")
+    perf.lap("render.form")
 
 # ─────────────────────────────────────────
 # 頁面：成員管理
@@ -537,61 +762,54 @@ elif page == "👥 成員管理":
     st.divider()
 
     # 每位成員目前負責的活動
+    perf.lap("render.members")
     st.markdown("### 成員任務負載")
     if not tasks_df.empty:
-        for _, m in members_df.iterrows():
-            name    = m['姓名']
-            my_tasks = tasks_df[
-                (tasks_df['負責人'] == name) &
-                (~tasks_df['審核狀態'].isin(STATUS_DONE))
-            ]
-            cnt  = len(my_tasks)
-            ac   = avatar_color(name)
-            init = name[0] if name else "？"
-
-            with st.expander(f"{'🟡' if cnt>3 else '🟢'} {name}（{m.get('職稱','')}）— 待完成 {cnt} 項"):
+        today = pd.Timestamp.now().normalize()
+        load  = snap.memo(("workload", today), lambda s: Workload(s.tasks, today))
+        st.dataframe(load.summary.reindex(members_df['姓名'], fill_value=0), use_container_width=True)
+        for name, role in zip(members_df['姓名'], members_df['職稱']):
+            cnt     = load.get(name, '待完成')
+            overdue = load.get(name, '逾期')
+            label   = f"{'🟡' if cnt>3 else '🟢'} {name}（{role}）— 待完成 {cnt} 項" + (f"，逾期 {overdue} 項" if overdue else "")
+            with st.expander(label):
+                my_tasks = load.tasks_of(name)
                 if my_tasks.empty:
                     st.success("目前無待完成任務 🎉")
                 else:
-                    sc_map = {"進行中":"background-color:#dbeafe;color:#1e40af",
-                              "待審核":"background-color:#fff3cd;color:#856404",
-                              "需修改":"background-color:#fde8e8;color:#b91c1c",
-                              "待執行":"background-color:#e9ecef;color:#555"}
                     dcols = [c for c in ['活動名稱','SOP步驟','審核狀態','預計完成日'] if c in my_tasks.columns]
                     st.dataframe(
-                        my_tasks[dcols].style.applymap(lambda v: sc_map.get(v,""), subset=['審核狀態']),
+                        my_tasks[dcols].assign(審核狀態=my_tasks['審核狀態'].map(STATUS_LABEL)),
                         use_container_width=True, hide_index=True,
                         column_config={"預計完成日":st.column_config.DateColumn("預計完成",format="MM-DD")})
     else:
         st.info("Campaign_Tasks 尚無資料。")
 
+    perf.lap("workload")
     st.divider()
     st.markdown("### ✏️ 新增成員")
     st.caption("新增後會直接寫入 Team_Members 分頁")
     a1,a2,a3,a4 = st.columns(4)
     nm_name  = a1.text_input("姓名")
-    nm_role  = a2.selectbox("職稱",["行銷企劃","美術設計","文案","主管","其他"])
+    nm_role  = a2.selectbox("職稱",MEMBER_ROLES)
     nm_scope = a3.multiselect("負責 SOP 範疇", SOP_STEPS)
     if a4.button("➕ 新增成員", use_container_width=True):
         if not nm_name:
             st.error("❌ 請填寫姓名")
         else:
             try:
-                conn = st.connection("gsheets", type=GSheetsConnection)
-                raw  = conn.read(worksheet="Team_Members", ttl=0).dropna(how="all")
-                # 產生新 ID
-                ids  = raw['成員ID'].astype(str).str.extract(r'M(\d+)')[0].dropna().astype(int)
-                new_id = f"M{(ids.max()+1):03d}" if not ids.empty else "M001"
+                new_id = get_id_allocator().reserve("M")[0]
                 new_member = pd.DataFrame([{
                     "成員ID": new_id, "姓名": nm_name, "職稱": nm_role,
                     "負責範疇": ", ".join(nm_scope), "狀態": "在職"
                 }])
-                conn.update(worksheet="Team_Members", data=pd.concat([raw, new_member], ignore_index=True))
-                st.cache_data.clear()
+                get_storage().append_rows("Team_Members", new_member)
+                apply_rows("Team_Members", new_member)
                 st.toast(f"✅ 已新增成員：{nm_name}")
                 st.rerun()
             except Exception as e:
                 st.error(f"新增失敗：{e}")
+    perf.lap("render.form")
 
 # ─────────────────────────────────────────
 # 頁面：活動進程 (情報室)
@@ -602,17 +820,15 @@ elif page == "📊 活動進程 (情報室)":
     st.title("📊 馬尼行銷活動進程")
     st.markdown(f"📅 今天是：**{today.strftime('%Y-%m-%d')} ({wd})**")
 
-    tab1,tab2,tab3,tab4,tab5 = st.tabs(["🔥 今日任務","📅 活動行程表","⏳ 年度甘特圖","💡 企畫庫","📂 完整資料庫"])
+    tab1,tab2,tab3,tab6,tab4,tab5,tab7 = st.tabs(["🔥 今日任務","📅 活動行程表","⏳ 年度甘特圖","📆 發文日曆","💡 企畫庫",
+                                                 "📂 完整資料庫","🔎 搜尋"])
 
     with tab1:
         c1,c2 = st.columns(2)
-        exec_df = df[df['活動狀態'].str.contains("執行中",na=False)]
+        exec_df = executing(intervals.active_on(today))
         with c1:
             st.subheader("✅ 今日常態發文")
-            mask = (exec_df['類型']=='常態')&(exec_df['開始日期']<=today)&(exec_df['結束日期']>=today)
-            routine = exec_df[mask].copy()
-            if not routine.empty:
-                routine = routine[routine.apply(lambda x: x['週期模式']=='每日' or (wd in str(x['重複星期'])),axis=1)]
+            routine = routine_on(exec_df, today)
             if not routine.empty:
                 for _,row in routine.iterrows():
                     with st.container(border=True):
@@ -622,7 +838,7 @@ elif page == "📊 活動進程 (情報室)":
             else: st.success("今日無常態任務。")
         with c2:
             st.subheader("🚀 進行中的行銷案")
-            active = exec_df[(exec_df['類型']=='行銷案')&(exec_df['開始日期']<=today)&(exec_df['結束日期']>=today)]
+            active = exec_df[exec_df['類型']=='行銷案']
             if not active.empty:
                 for _,row in active.iterrows():
                     dl  = (row['結束日期']-today).days
@@ -633,52 +849,153 @@ elif page == "📊 活動進程 (情報室)":
                         if str(row.get('相關連結','')).startswith("http"): st.link_button("🔗 查看企劃",row['相關連結'])
             else: st.info("目前無大型活動。")
 
+    perf.lap("tab.today")
+
     with tab2:
         st.subheader("🗓️ 活動行程總覽")
-        cs,_ = st.columns([1,2])
+        cs,cl = st.columns([1,2])
+        lane2 = FIGURE_LANES[cl.radio("分列方式", list(FIGURE_LANES), horizontal=True, key="lane_timeline",
+                                      help=f"自動：超過 {ROW_LIMIT} 個活動時依負責人分列")]
         with cs:
             td = date.today(); sd = td.replace(day=1)
             ed = (td.replace(day=28)+timedelta(days=4)).replace(day=1)-timedelta(days=1)
             dr = st.date_input("📅 請選擇顯示區間",value=(sd,ed),key="range_picker")
         if len(dr)==2:
             sts=pd.Timestamp(dr[0]); ets=pd.Timestamp(dr[1])
-            fdf=df[(df['開始日期']<=ets)&(df['結束日期']>=sts)].copy()
+            fdf=intervals.overlapping(sts,ets)
             if not fdf.empty:
-                fig=px.timeline(fdf,x_start="開始日期",x_end="結束日期",y="活動名稱",color="活動狀態",text="活動名稱",
-                    hover_data={"活動名稱":False,"刊登平台":True,"文案重點":True},custom_data=["相關連結","活動名稱"])
-                fig.update_traces(textposition='inside',insidetextanchor='start')
-                fig.update_xaxes(range=[sts,ets],tickformat="%d",dtick="D3" if mobile_mode else "D1",
-                    side="top",tickangle=0 if mobile_mode else -45,tickfont=dict(size=11))
-                fig.update_yaxes(autorange="reversed")
-                ls = dict(orientation="h",yanchor="bottom",y=1.02,xanchor="right",x=1) if mobile_mode else {}
-                fig.update_layout(height=max(400,len(fdf)*50),showlegend=True,legend=ls)
-                ev = st.plotly_chart(fig,use_container_width=True,on_select="rerun",selection_mode="points")
-                if ev and ev["selection"]["points"]:
+                get_metrics().count("figure_cache_lookup")
+                fig = timeline_chart(snap.version, sts, ets, mobile_mode, lane2, fdf)
+                ev  = st.plotly_chart(fig,use_container_width=True,on_select="rerun",selection_mode="points")
+                if ev and ev["selection"]["points"] and ev["selection"]["points"][0].get("customdata"):
                     pt=ev["selection"]["points"][0]; st.divider(); st.info(f"👉 您選擇了：**{pt['customdata'][1]}**")
                     if str(pt['customdata'][0]).startswith("http"): st.link_button("🔗 前往連結",pt['customdata'][0],type="primary")
                     else: st.warning("此活動未設定相關連結。")
             else: st.info("所選區間內沒有活動。")
 
+    perf.lap("figure.timeline")
+
     with tab3:
         st.subheader("⏳ 年度甘特圖")
-        cdf = df[df['類型']=='行銷案']
+        lane3 = FIGURE_LANES[st.radio("分列方式", list(FIGURE_LANES), horizontal=True, key="lane_gantt",
+                                      help=f"自動：超過 {ROW_LIMIT} 個活動時依負責人分列")]
+        cdf = snap.memo("campaigns", lambda s: s.schedule[s.schedule['類型']=='行銷案'])
         if not cdf.empty:
-            fig=px.timeline(cdf,x_start="開始日期",x_end="結束日期",y="活動名稱",
-                color="活動狀態",hover_data=["刊登平台","負責人"],title="年度活動檔期")
-            fig.update_xaxes(tickformat="%Y/%m/%d",dtick="M1",ticklabelmode="period")
-            fig.add_vline(x=today.timestamp()*1000,line_width=2,line_dash="dash",line_color="red")
-            fig.update_yaxes(autorange="reversed"); st.plotly_chart(fig,use_container_width=True)
+            get_metrics().count("figure_cache_lookup")
+            st.plotly_chart(gantt_chart(snap.version, today, mobile_mode, lane3, cdf), use_container_width=True)
         else: st.write("尚無資料。")
 
+    perf.lap("figure.gantt")
+
+    with tab6:
+        st.subheader("📆 常態發文日曆")
+        k1,k2,k3 = st.columns([1,1,2])
+        cal_view   = k1.radio("檢視", ["月","年"], horizontal=True, key="cal_view")
+        cal_anchor = pd.Timestamp(k2.date_input("月份 / 年份", value=today.date(), key="cal_anchor"))
+        with_plan  = k3.checkbox("包含企畫中的活動", value=False, key="cal_plan")
+        if cal_view == "月":
+            w_start = cal_anchor.replace(day=1); w_end = w_start + pd.offsets.MonthEnd(0)
+        else:
+            w_start = cal_anchor.replace(month=1, day=1); w_end = cal_anchor.replace(month=12, day=31)
+        occ = snap.memo(("occurrences", w_start, w_end, with_plan), lambda s: occurrences(
+            calendar_campaigns(s.intervals.overlapping(w_start, w_end), with_plan), w_start, w_end))
+        per_day = daily_counts(occ, w_start, w_end)
+        m1,m2,m3 = st.columns(3)
+        m1.metric("發文總數", len(occ))
+        m2.metric("單日最多", int(per_day.max()) if len(per_day) else 0)
+        m3.metric("常態活動數", occ['活動名稱'].nunique())
+
+        if len(occ) <= CALENDAR_EVENT_LIMIT:
+            events = [{"title": f"{n}（{p}）", "start": d.strftime("%Y-%m-%d"), "allDay": True}
+                      for d, n, p in zip(occ['發文日'], occ['活動名稱'], occ['刊登平台'])]
+        else:   # 發文太多時每天只放一個總數
+            events = [{"title": f"📮 {c} 則發文", "start": d.strftime("%Y-%m-%d"), "allDay": True}
+                      for d, c in per_day[per_day > 0].items()]
+        try:
+            from streamlit_calendar import calendar
+            calendar(events=events, key=f"cal_{cal_view}_{w_start:%Y%m}", options={
+                "initialView": "dayGridMonth" if cal_view == "月" else "multiMonthYear",
+                "initialDate": w_start.strftime("%Y-%m-%d"), "locale": "zh-tw",
+                "headerToolbar": {"left": "", "center": "title", "right": ""}})
+        except ImportError:
+            st.caption("未安裝 streamlit-calendar，僅顯示每日統計")
+
+        st.markdown("#### 每日發文量（依負責人）")
+        st.bar_chart(daily_counts(occ, w_start, w_end, by="負責人"))
+
+        ics_states = ["企畫中","執行中"] if with_plan else ["執行中"]
+        st.download_button("📅 下載行事曆 (.ics)", on_click="ignore", mime=FORMATS["ics"][0],
+            data=export_data(snap.version, "marketing-" + "-".join(ics_states) + ".ics",
+                             lambda: iter_ics(df, ics_states)),
+            file_name="marketing.ics", help="常態活動依週期模式 / 重複星期設為重複事件，可匯入 Google 日曆、Outlook")
+
+    perf.lap("calendar")
+
     with tab4:
         st.subheader("💡 企畫中草案")
         pdf = df[df['活動狀態'].str.contains("企畫中",na=False)]
-        if not pdf.empty: st.dataframe(pdf,use_container_width=True)
+        if not pdf.empty: st.dataframe(pdf,use_container_width=True,column_config={"星期遮罩":None})
         else: st.info("目前沒有企畫中的草案。")
 
     with tab5:
         st.subheader("📝 所有紀錄")
-        st.dataframe(df,use_container_width=True,
-            column_config={"相關連結":st.column_config.LinkColumn("連結",display_text="開啟"),
+        all_df = df
+        if st.checkbox("📦 包含已封存的活動", key="with_archive"):
+            cold = load_archive("Marketing_Schedule")
+            if cold is None: st.info("尚未封存過任何活動。")
+            else:
+                all_df = concat_frames(df, cold)
+                st.caption(f"進行中資料 {len(df)} 筆 ＋ 封存 {len(cold)} 筆")
+                cold_tasks = load_archive("Campaign_Tasks")
+                if cold_tasks is not None:
+                    with st.expander(f"封存的已完成任務（{len(cold_tasks)} 筆）"):
+                        st.dataframe(cold_tasks, use_container_width=True, hide_index=True)
+        st.dataframe(all_df,use_container_width=True,
+            column_config={"星期遮罩":None,
+                "相關連結":st.column_config.LinkColumn("連結",display_text="開啟"),
                 "開始日期":st.column_config.DateColumn("開始",format="YYYY-MM-DD"),
                 "結束日期":st.column_config.DateColumn("結束",format="YYYY-MM-DD")})
+
+        st.markdown("#### ⬇️ 匯出")
+        for col, (ws, fmt) in zip(st.columns(4), [(w, f) for w in ("Marketing_Schedule","Campaign_Tasks")
+                                                 for f in ("csv","parquet")]):
+            mime, ext = FORMATS[fmt]
+            col.download_button(f"{SHEET_LABELS[ws]} {fmt.upper()}", on_click="ignore", mime=mime,
+                data=export_data(snap.version, ws + ext, lambda f=snap.frames[ws], fmt=fmt: iter_export(fmt, f)),
+                file_name=ws + ext, key=f"export_{ws}_{fmt}")
+        st.caption("匯出目前版本的進行中資料（不含封存）")
+    perf.lap("tab.tables")
+
+    with tab7:
+        st.subheader("🔎 搜尋活動與任務")
+        query = st.text_input("關鍵字", key="search_query",
+                              placeholder="活動名稱、文案重點、刊登平台、呈現形式、任務說明或備註")
+        f1,f2,f3 = st.columns(3)
+        owners   = sorted(o for o in df['負責人'].dropna().astype(str).unique() if o)
+        s_owner  = f1.selectbox("負責人", ["全部"] + owners, key="search_owner")
+        s_status = f2.multiselect("活動狀態", CAMPAIGN_STATES, key="search_status")
+        s_range  = f3.date_input("日期區間（與活動期間重疊）", value=(), key="search_range")
+        if query.strip():
+            index = get_search_index()
+            index.sync(snap)
+            t0   = datetime.now()
+            hits = index.search(query, None if s_owner == "全部" else s_owner, s_status,
+                                s_range[0] if len(s_range) > 0 else None,
+                                s_range[1] if len(s_range) > 1 else None, SEARCH_LIMIT)
+            ms   = (datetime.now() - t0).total_seconds() * 1000
+            if hits.empty:
+                st.info("找不到符合的活動。")
+            else:
+                st.caption(f"共 {len(hits)} 筆（最多顯示 {SEARCH_LIMIT} 筆，{ms:.0f} ms）；任務命中 = 任務說明或備註符合的子任務數")
+                st.dataframe(hits[['相關度','活動名稱','活動狀態','負責人','開始日期','結束日期','刊登平台','呈現形式',
+                                   '文案重點','任務命中','相關連結']],
+                    use_container_width=True, hide_index=True,
+                    column_config={"相關連結":st.column_config.LinkColumn("連結",display_text="開啟"),
+                        "開始日期":st.column_config.DateColumn("開始",format="YYYY-MM-DD"),
+                        "結束日期":st.column_config.DateColumn("結束",format="YYYY-MM-DD")})
+    perf.lap("search")
+
+# ─────────────────────────────────────────
+# 效能量測：本次重跑結束
+# ─────────────────────────────────────────
+perf.finish()
@@ -0,0 +1,22 @@
+"""馬尼行銷活動進程：資料層（儲存後端、索引等），不依賴 Streamlit 頁面即可匯入"""
+from .archive import archive, cold_masks, read_archive
+from .cards import (active_section, cache_stats, routine_section, soon_section, sop_bar_color, sop_html,
+                    urgent_section)
+from .constants import (CAMPAIGN_STATES, CAMPAIGN_TYPES, CYCLE_MODES, MEMBER_ROLES, SOP_STEPS,
+                        STATUS_DONE, STATUS_WIP, TASK_STATUSES, WEEKDAY_MAP)
+from .figures import ROW_LIMIT, gantt_figure, timeline_figure
+from .ids import IdAllocator, format_id, max_id
+from .kpi import compute_kpi, executing, next_task_id
+from .load import (DERIVE, FALLBACKS, PARSERS, empty_members, empty_tasks, load_snapshot, loaders, parse_members,
+                   parse_schedule, parse_tasks)
+from .metrics import MeteredStorage, Metrics, Run, profiled
+from .refresher import SheetRefresher
+from .schedule import DateIntervals, daily_counts, occurrences, routine_on, weekday_mask
+from .schema import SCHEMAS, Schema, concat_frames
+from .search import SearchIndex, tokenize
+from .snapshot import Snapshot
+from .sop import SopIndex, get_sop_status, sop_progress_pct, sop_task_rows
+from .storage import (ARCHIVE_WORKSHEETS, WORKSHEETS, GSheetsBackend, SQLiteBackend, StorageBackend,
+                      make_storage, patch_frame)
+from .workload import Workload, default_owners
+from .writequeue import WriteQueue
@@ -0,0 +1,48 @@
+"""冷熱分離：已結束的活動與其已完成的任務搬到封存工作表（ARCHIVE_WORKSHEETS），
+日常讀取只載入仍在進行的熱資料，封存內容由「完整資料庫」需要時才讀取。"""
+from .constants import STATUS_DONE
+from .schema import SCHEMAS
+from .storage import ARCHIVE_WORKSHEETS
+
+
+def cold_masks(schedule, tasks, cutoff):
+    """schedule / tasks 為解析後的資料，回傳 (活動遮罩, 任務遮罩)。
+
+    冷資料 = 結束日期早於 cutoff 的「已結束」活動，以及這些活動底下已完成的任務；
+    同名活動還有未封存的列時，任務仍留在熱資料。
+    """
+    ended = schedule['活動狀態'].eq('已結束') & schedule['結束日期'].lt(cutoff)
+    names = set(schedule.loc[ended, '活動名稱']) - set(schedule.loc[~ended, '活動名稱'])
+    return ended, tasks['活動名稱'].isin(names) & tasks['審核狀態'].isin(STATUS_DONE)
+
+
+def archive(store, cutoff):
+    """把冷資料從 Marketing_Schedule / Campaign_Tasks 搬到封存工作表，回傳 {工作表: 搬移筆數}。
+
+    原始列原樣搬移（不經解析）。先附加到封存表再改寫原表，中途失敗最多在封存表留下重複列，不會遺失資料；
+    改寫原表期間的其他寫入可能被覆蓋，呼叫前應先送出待寫入的變更。
+    """
+    raw = {ws: store.read_worksheet(ws, ttl=0) for ws in ARCHIVE_WORKSHEETS}
+    masks = cold_masks(SCHEMAS["Marketing_Schedule"].normalize(raw["Marketing_Schedule"]),
+                       SCHEMAS["Campaign_Tasks"].normalize(raw["Campaign_Tasks"]), cutoff)
+    moved = {}
+    for ws, mask in zip(ARCHIVE_WORKSHEETS, masks):
+        mask = mask.to_numpy()
+        if mask.any():
+            store.append_rows(ARCHIVE_WORKSHEETS[ws], raw[ws][mask])
+            store.replace_worksheet(ws, raw[ws][~mask])
+        moved[ws] = int(mask.sum())
+    return moved
+
+
+def read_archive(store, ws):
+    """讀取 ws 的封存內容（原始列）；還沒封存過、封存表不存在時回傳 None"""
+    name = ARCHIVE_WORKSHEETS[ws]
+    try:
+        return store.read_worksheet(name, ttl=0)
+    except KeyError:             # SQLite：資料表不存在
+        return None
+    except Exception as e:
+        if type(e).__name__ == "WorksheetNotFound":   # gspread，不為此匯入 gspread
+            return None
+        raise
@@ -0,0 +1,168 @@
+"""合成資料壓測：以固定亂數種子產生三張工作表，寫進本機 SQLite 後量測載入、KPI 與繪圖等熱點。
+
+    python -m marketing_core.bench                       # 1k / 10k / 100k 列
+    python -m marketing_core.bench --sizes 1000 --repeat 5 --out bench.json
+
+每個規模 n：Marketing_Schedule n 列、Campaign_Tasks n 列（n/5 個活動 × 5 個 SOP 步驟）、
+Team_Members n/100 列（至少 10 人）。結果（每項取 repeat 次的中位數與最小值，單位秒）寫成 JSON，
+不同版本各跑一次即可比較。完全離線，不需要 Google Sheets 或 Streamlit。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .constants import SOP_STEPS, STATUS_DONE, WEEKDAY_MAP
+from .figures import gantt_figure, timeline_figure
+from .kpi import compute_kpi, next_task_id
+from .load import PARSERS
+from .schedule import DateIntervals, occurrences
+from .schema import SCHEMAS
+from .sop import SopIndex, get_sop_status, sop_progress_pct
+from .storage import SQLiteBackend
+from .workload import Workload, default_owners
+
+SIZES     = (1_000, 10_000, 100_000)
+PLATFORMS = ["FB", "IG", "LINE", "Threads", "官網", "FB, IG"]
+FORMS     = ["貼文", "限動", "短影音", "直播", "圖文"]
+ROLES     = ["行銷企劃", "美術設計", "文案", "社群小編", "數據分析"]
+
+
+def _dates(days):
+    return pd.to_datetime(days, unit="D").strftime("%Y-%m-%d")
+
+
+def generate(n, seed=0, today=None):
+    """產生 {工作表: 原始 DataFrame}（與從試算表讀回的一樣都是文字）"""
+    rng   = np.random.default_rng(seed)
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    base  = (today - pd.Timestamp(0)).days
+
+    n_members = max(10, n // 100)
+    names     = np.array([f"成員{i:04d}" for i in range(n_members)])
+    scopes    = [", ".join(rng.choice(SOP_STEPS, rng.integers(1, 3), replace=False)) for _ in range(n_members)]
+    members   = pd.DataFrame({
+        "成員ID": [f"M{i + 1:03d}" for i in range(n_members)], "姓名": names,
+        "職稱": rng.choice(ROLES, n_members), "負責範疇": scopes,
+        "狀態": rng.choice(["在職", "離職"], n_members, p=[0.9, 0.1])})
+
+    # 三年內的活動，大多已結束；常態活動期間較長
+    routine = rng.random(n) < 0.3
+    start   = base - rng.integers(0, 3 * 365, n) + 90
+    length  = np.where(routine, rng.integers(30, 366, n), rng.integers(7, 61, n))
+    end     = start + length
+    state   = np.where(end < base, np.where(rng.random(n) < 0.95, "已結束", "執行中"),
+                       np.where(start > base, "企畫中", np.where(rng.random(n) < 0.85, "執行中", "企畫中")))
+    daily   = routine & (rng.random(n) < 0.4)
+    weekly  = [", ".join(sorted(rng.choice(list(WEEKDAY_MAP.values()), rng.integers(1, 4), replace=False),
+                                key=list(WEEKDAY_MAP.values()).index)) for _ in range(n)]
+    owner   = np.where(rng.random(n) < 0.1, "", rng.choice(names, n))
+    campaign_names = np.array([f"活動{i:06d}" for i in range(n)])
+    schedule = pd.DataFrame({
+        "類型": np.where(routine, "常態", "行銷案"), "活動名稱": campaign_names,
+        "刊登平台": rng.choice(PLATFORMS, n), "呈現形式": rng.choice(FORMS, n),
+        "開始日期": _dates(start), "結束日期": _dates(end),
+        "週期模式": np.where(daily, "每日", np.where(routine, "重覆 (特定星期)", "單次")),
+        "重複星期": np.where(daily, "每日", np.where(routine, weekly, "")),
+        "文案重點": [f"重點 {i}" for i in range(n)], "負責人": owner,
+        "相關連結": np.where(rng.random(n) < 0.5, "https://example.com", ""), "活動狀態": state})
+
+    # 前 n/5 個活動各有 5 個 SOP 子任務；已結束活動的任務幾乎都已核准
+    k     = max(1, n // len(SOP_STEPS))
+    camp  = np.repeat(np.arange(k), len(SOP_STEPS))[:n]
+    step  = np.tile(np.arange(len(SOP_STEPS)), k)[:n]
+    ended = state[camp] == "已結束"
+    status = np.where(ended & (rng.random(len(camp)) < 0.97), "已核准",
+                      rng.choice(["待執行", "進行中", "待審核", "已核准", "需修改"], len(camp),
+                                 p=[0.3, 0.25, 0.15, 0.2, 0.1]))
+    due  = start[camp] + step * 2
+    done = np.isin(status, STATUS_DONE) & (rng.random(len(camp)) < 0.8)
+    tasks = pd.DataFrame({
+        "任務ID": [f"T{i + 1:03d}" for i in range(len(camp))], "活動名稱": campaign_names[camp],
+        "SOP步驟": np.array(SOP_STEPS)[step], "任務說明": "", "負責人": rng.choice(np.append(names, ""), len(camp)),
+        "審核狀態": status, "預計完成日": _dates(due),
+        "實際完成日": np.where(done, _dates(due + rng.integers(-2, 4, len(camp))), ""), "備註": ""})
+    return {"Marketing_Schedule": schedule, "Campaign_Tasks": tasks, "Team_Members": members}
+
+
+def _time(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"median": statistics.median(runs), "min": min(runs)}
+
+
+def run_size(n, repeat=3, seed=0, db_path=None):
+    """量測單一規模，回傳 {項目: {"median", "min"}}"""
+    today = pd.Timestamp.now().normalize()
+    store = SQLiteBackend(db_path or os.path.join(tempfile.mkdtemp(prefix="marketing-bench-"), "bench.db"))
+    store.restore(generate(n, seed, today))
+
+    raw   = {}
+    out   = {}
+    out["storage_read"] = _time(lambda: raw.update({ws: store.read_worksheet(ws, ttl=0) for ws in SCHEMAS}), repeat)
+
+    def normalize():   # 與 App、命令列相同的解析（load.PARSERS）
+        return {ws: PARSERS[ws](raw[ws]) for ws in SCHEMAS}
+    out["normalize"] = _time(normalize, repeat)
+    frames  = normalize()
+    df, tasks, members = frames["Marketing_Schedule"], frames["Campaign_Tasks"], frames["Team_Members"]
+    active_members = members[members["狀態"] == "在職"]
+
+    out["build_indexes"] = _time(lambda: (DateIntervals(df), SopIndex(tasks)), repeat)
+    intervals, sop_index = DateIntervals(df), SopIndex(tasks)
+    out["compute_kpi"]   = _time(lambda: compute_kpi(df, today, intervals), repeat)
+    names = df["活動名稱"].tolist()
+    out["sop_status_all"] = _time(lambda: [sop_progress_pct(get_sop_status(c, sop_index)) for c in names], repeat)
+    out["next_task_id"]   = _time(lambda: next_task_id(tasks), repeat)
+    out["member_workload"] = _time(lambda: (Workload(tasks, today), default_owners(active_members)), repeat)
+    out["occurrences_year"] = _time(lambda: occurrences(df, today, today + pd.Timedelta(days=364)), repeat)
+
+    month = intervals.overlapping(today.replace(day=1), today.replace(day=1) + pd.offsets.MonthEnd(0))
+    out["timeline_figure"] = _time(lambda: timeline_figure(month, today.replace(day=1),
+                                                           today + pd.offsets.MonthEnd(0), False).to_json(), repeat)
+    campaigns = df[df["類型"] == "行銷案"]
+    out["gantt_figure"] = _time(lambda: gantt_figure(campaigns, today, False).to_json(), repeat)
+    out["rows"] = {ws: len(f) for ws, f in frames.items()}
+    return out
+
+
+def run(sizes=SIZES, repeat=3, seed=0):
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "seed": seed, "repeat": repeat,
+               "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+               "sizes": {}}
+    for n in sizes:
+        results["sizes"][str(n)] = run_size(n, repeat, seed)
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="馬尼行銷活動進程：合成資料壓測")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="每張工作表的列數")
+    ap.add_argument("--repeat", type=int, default=3, help="每項重複次數（取中位數）")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_results.json", help="結果 JSON 路徑")
+    args = ap.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    for n, items in results["sizes"].items():
+        print(f"── {n} 列")
+        for name, t in items.items():
+            if name != "rows":
+                print(f"  {name:<18} {t['median'] * 1000:10.1f} ms")
+    print(f"結果已寫入 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""指揮中心卡片與 SOP 列的 HTML。
+
+模板在匯入時就編好（str.format），每個區塊（緊急、7 天內、常態、進行中）組成一段 HTML 一次輸出；
+單張卡片與 SOP 列依（活動內容, SOP 狀態）快取，資料沒變的卡片不會在每次重跑時重組字串。
+"""
+from functools import lru_cache
+
+from .constants import SOP_STEPS, STATUS_DONE, STATUS_WIP
+from .sop import EMPTY_STEP
+
+SOP_STEP = '<div class="sop-step {cls}">{icon} {step}<span class="sop-owner">{owner}</span></div>'.format
+SOP_ROW  = '<div class="sop-row">{steps}</div>'.format
+LINK     = '<a href="{url}" target="_blank" style="font-size:12px;">{label}</a>'.format
+BAR      = ('<div class="progress-wrap"><div class="progress-bar" '
+            'style="width:{pct}%;background:{color}"></div></div>').format
+SECTION  = '<div class="card-section">{cards}</div>'.format
+
+URGENT_CARD = ('<div class="campaign-card card-urgent"><b>{name}</b>'
+               '<span class="badge badge-red">剩 {days} 天</span><br>'
+               '<small>📢 {platform} ｜ 負責人：{owner}</small></div>').format
+SOON_CARD = ('<div class="campaign-card card-plan"><b>{name}</b>'
+             '<span class="badge {badge}">剩 {days} 天</span><br>'
+             '<small>結束：{end} ｜ 負責人：{owner}</small></div>').format
+ROUTINE_CARD = ('<div class="campaign-card card-normal"><b>{name}</b>'
+                '<span class="badge badge-blue">{mode}</span><br>'
+                '<small>📢 {platform}</small>{bar}'
+                '<small style="color:#888">SOP 完成度 {pct}%</small>{sop}{link}</div>').format
+ACTIVE_CARD = ('<div class="campaign-card card-normal"><b>{name}</b>'
+               '<span class="badge badge-red" style="float:right">剩 {days} 天</span><br>'
+               '<small>時程進度 {tpct}%</small>{bar}'
+               '<small>📢 {platform} ｜ 負責人：{owner}</small><br>'
+               '<small style="color:#888">SOP 完成度 {pct}%</small>{sop}{link}</div>').format
+
+
+def sop_bar_color(pct):
+    return "#2ecc71" if pct >= 80 else "#3498db" if pct >= 40 else "#f39c12"
+
+
+def sop_state(sop_dict):
+    """SOP 狀態的可雜湊表示：((狀態, 負責人), ...) 依 SOP_STEPS 順序"""
+    return tuple((sop_dict.get(step, EMPTY_STEP)["status"], sop_dict.get(step, EMPTY_STEP)["owner"])
+                 for step in SOP_STEPS)
+
+
+@lru_cache(maxsize=4096)
+def sop_row_html(state):
+    steps = []
+    for step, (s, o) in zip(SOP_STEPS, state):
+        if s in STATUS_DONE:   cls, icon = "sop-done",  "✓"
+        elif s == "需修改":     cls, icon = "sop-block", "✗"
+        elif s in STATUS_WIP:  cls, icon = "sop-wip",   "⋯"
+        else:                  cls, icon = "sop-todo",  "○"
+        steps.append(SOP_STEP(cls=cls, icon=icon, step=step, owner=o or "—"))
+    return SOP_ROW(steps="".join(steps))
+
+
+def sop_html(sop_dict):
+    return sop_row_html(sop_state(sop_dict))
+
+
+def _link(url, label):
+    return LINK(url=url, label=label) if url.startswith("http") else ""
+
+
+@lru_cache(maxsize=4096)
+def urgent_card(name, days, platform, owner):
+    return URGENT_CARD(name=name, days=days, platform=platform, owner=owner)
+
+
+@lru_cache(maxsize=4096)
+def soon_card(name, days, end, owner):
+    return SOON_CARD(name=name, days=days, end=end, owner=owner,
+                     badge="badge-red" if days <= 3 else "badge-amber")
+
+
+@lru_cache(maxsize=4096)
+def routine_card(name, mode, platform, pct, url, state):
+    return ROUTINE_CARD(name=name, mode=mode, platform=platform, pct=pct,
+                        bar=BAR(pct=pct, color=sop_bar_color(pct)),
+                        sop=sop_row_html(state), link=_link(url, "🔗 前往素材"))
+
+
+@lru_cache(maxsize=4096)
+def active_card(name, days, tpct, platform, owner, pct, url, state):
+    color = "#e74c3c" if days <= 3 else "#f39c12" if days <= 7 else "#2ecc71"
+    return ACTIVE_CARD(name=name, days=days, tpct=tpct, platform=platform, owner=owner, pct=pct,
+                       bar=BAR(pct=tpct, color=color), sop=sop_row_html(state), link=_link(url, "🔗 查看企劃"))
+
+
+def _col(rows, col, default=""):
+    """取欄位為字串清單；欄位不存在時整欄為 default"""
+    return rows[col].astype(str).tolist() if col in rows.columns else [default] * len(rows)
+
+
+def _days(dates, today):
+    return (dates - today).dt.days.astype(int).tolist()
+
+
+def urgent_section(rows, today):
+    return SECTION(cards="".join(map(urgent_card, _col(rows, "活動名稱"), _days(rows["結束日期"], today),
+                                     _col(rows, "刊登平台"), _col(rows, "負責人", "—"))))
+
+
+def soon_section(rows, today):
+    return SECTION(cards="".join(map(soon_card, _col(rows, "活動名稱"), _days(rows["結束日期"], today),
+                                     rows["結束日期"].dt.strftime("%Y-%m-%d").tolist(),
+                                     _col(rows, "負責人", "—"))))
+
+
+def routine_section(rows, sop_index):
+    names = _col(rows, "活動名稱")
+    return SECTION(cards="".join(map(routine_card, names, _col(rows, "週期模式"), _col(rows, "刊登平台"),
+                                     [sop_index.pct.get(n, 0) for n in names], _col(rows, "相關連結"),
+                                     [sop_state(sop_index.get(n)) for n in names])))
+
+
+def active_section(rows, today, sop_index):
+    names = _col(rows, "活動名稱")
+    dur   = (rows["結束日期"] - rows["開始日期"]).dt.days.clip(lower=1)
+    tpct  = ((today - rows["開始日期"]).dt.days / dur * 100).astype(int).clip(upper=100).tolist()
+    return SECTION(cards="".join(map(active_card, names, _days(rows["結束日期"], today), tpct,
+                                     _col(rows, "刊登平台"), _col(rows, "負責人", "—"),
+                                     [sop_index.pct.get(n, 0) for n in names], _col(rows, "相關連結"),
+                                     [sop_state(sop_index.get(n)) for n in names])))
+
+
+def cache_stats():
+    """卡片與 SOP 列片段快取的累計命中 / 未命中次數"""
+    infos = [f.cache_info() for f in (sop_row_html, urgent_card, soon_card, routine_card, active_card)]
+    return {"card_cache_hit": sum(i.hits for i in infos), "card_cache_miss": sum(i.misses for i in infos)}
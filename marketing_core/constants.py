@@ -0,0 +1,10 @@
+"""App 與資料層共用的常數"""
+WEEKDAY_MAP = {0:"每週一",1:"每週二",2:"每週三",3:"每週四",4:"每週五",5:"每週六",6:"每週日"}
+SOP_STEPS   = ["企畫撰寫","素材製作","文案審核","排程上線","成效回報"]
+STATUS_DONE = ["已核准"]
+STATUS_WIP  = ["進行中","待審核","需修改"]
+TASK_STATUSES   = ["待執行","進行中","待審核","已核准","需修改"]
+CAMPAIGN_TYPES  = ["行銷案","常態"]
+CAMPAIGN_STATES = ["企畫中","執行中","已結束"]
+CYCLE_MODES     = ["單次","每日","重覆 (特定星期)"]
+MEMBER_ROLES    = ["行銷企劃","美術設計","文案","主管","其他"]
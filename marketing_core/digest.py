@@ -0,0 +1,78 @@
+"""今日摘要：不啟動 Streamlit，直接讀儲存後端印出 KPI、即將到期活動與今日常態發文，給排程或聊天機器人用。
+
+    python -m marketing_core.digest                         # 依 MARKETING_STORAGE（預設 Google Sheets）
+    python -m marketing_core.digest --storage sqlite:///data/local.db --days 3 --json
+
+Google Sheets 後端沿用 Streamlit 的 secrets 設定（.streamlit/secrets.toml）；SQLite 後端完全不需要 Streamlit。
+"""
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from .kpi import compute_kpi, executing
+from .load import load_snapshot
+from .storage import make_storage
+
+
+def _records(frame, cols):
+    cols = [c for c in cols if c in frame.columns]
+    return frame[cols].astype(object).where(frame[cols].notna(), "").to_dict("records")
+
+
+def digest(snapshot, today, days=7):
+    """{"date", "weekday", "kpi", "expiring", "routine"}：與指揮中心同一套計算，可直接轉成 JSON"""
+    today    = pd.Timestamp(today).normalize()
+    kpi      = compute_kpi(snapshot.schedule, today, snapshot.intervals)
+    expiring = executing(snapshot.intervals.ending_within(today, days)).sort_values("結束日期")
+    expiring = expiring.assign(剩餘天數=(expiring["結束日期"] - today).dt.days,
+                               結束日期=expiring["結束日期"].dt.strftime("%Y-%m-%d"))
+    return {
+        "date":     today.strftime("%Y-%m-%d"),
+        "weekday":  kpi["weekday_str"],
+        "kpi":      {k: kpi[k] for k in ("active_count", "expire_7", "expire_3", "today_routine", "plan_count")},
+        "expiring": _records(expiring, ["活動名稱", "結束日期", "剩餘天數", "刊登平台", "負責人"]),
+        "routine":  _records(kpi["routine_df"], ["活動名稱", "刊登平台", "呈現形式", "負責人"]),
+    }
+
+
+def format_text(d, days=7):
+    k = d["kpi"]
+    lines = [f"📅 {d['date']} ({d['weekday']})",
+             f"進行中活動 {k['active_count']} ｜ 7 天內到期 {k['expire_7']} ｜ 3 天內緊急 {k['expire_3']} ｜ "
+             f"今日常態任務 {k['today_routine']} ｜ 企畫中草案 {k['plan_count']}",
+             f"── {days} 天內到期（{len(d['expiring'])}）"]
+    lines += [f"  剩 {r['剩餘天數']} 天  {r['活動名稱']}（{r['結束日期']} ｜ {r.get('刊登平台') or '—'} ｜ "
+              f"負責人：{r.get('負責人') or '—'}）" for r in d["expiring"]] or ["  無"]
+    lines.append(f"── 今日常態發文（{len(d['routine'])}）")
+    lines += [f"  {r['活動名稱']}（{r.get('刊登平台') or '—'} ｜ {r.get('呈現形式') or '—'} ｜ "
+              f"負責人：{r.get('負責人') or '—'}）" for r in d["routine"]] or ["  無"]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="馬尼行銷活動進程：今日摘要")
+    ap.add_argument("--storage", default=os.environ.get("MARKETING_STORAGE", "gsheets"),
+                    help="儲存後端：gsheets 或 sqlite:///路徑（預設讀環境變數 MARKETING_STORAGE）")
+    ap.add_argument("--date", default=None, help="以哪一天為今天，YYYY-MM-DD（預設今天）")
+    ap.add_argument("--days", type=int, default=7, help="列出幾天內到期的活動")
+    ap.add_argument("--json", action="store_true", help="輸出 JSON")
+    args = ap.parse_args(argv)
+
+    today = pd.Timestamp(args.date or pd.Timestamp.now()).normalize()
+    try:
+        snapshot = load_snapshot(make_storage(args.storage), fallbacks=False)
+    except Exception as e:   # 讀不到就不發摘要，避免把空表當成「今天沒有任務」
+        sys.exit(f"讀取資料失敗：{e}")
+    d = digest(snapshot, today, args.days)
+    if args.json:
+        json.dump(d, sys.stdout, ensure_ascii=False, indent=2, default=str)
+        print()
+    else:
+        print(format_text(d, args.days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""匯出：行程與任務的 CSV / Parquet，以及常態活動以 RRULE 表示的 iCalendar 行事曆。
+
+每種格式都是逐段產生（CSV 與 iCalendar 每 CHUNK_ROWS 個活動一段、Parquet 每段一個 row group），
+寫檔時不必先在記憶體組出完整內容。ExportCache 依資料版本把結果存成暫存檔，同一版本重複下載不再產生。
+
+    python -m marketing_core.export csv --sheet Campaign_Tasks --out tasks.csv
+    python -m marketing_core.export ics --out marketing.ics --storage sqlite:///data/local.db
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from .schedule import ALL_DAYS
+
+CHUNK_ROWS = 5000
+DERIVED    = ["星期遮罩"]   # 載入時算出的欄位，不屬於試算表
+BYDAY      = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+ICS_STATUS = {"企畫中": "TENTATIVE", "執行中": "CONFIRMED", "已結束": "CONFIRMED"}
+FORMATS    = {"csv": ("text/csv", ".csv"), "parquet": ("application/vnd.apache.parquet", ".parquet"),
+              "ics": ("text/calendar", ".ics")}
+
+
+def _sheet(frame):
+    return frame.drop(columns=[c for c in DERIVED if c in frame.columns])
+
+
+def iter_csv(frame, chunk_rows=CHUNK_ROWS):
+    """UTF-8（含 BOM，Excel 直接開啟中文不亂碼）CSV，逐段產生 bytes"""
+    frame = _sheet(frame)
+    for i in range(0, max(len(frame), 1), chunk_rows):
+        text = frame.iloc[i:i + chunk_rows].to_csv(index=False, header=i == 0, date_format="%Y-%m-%d")
+        yield (("\ufeff" if i == 0 else "") + text).encode("utf-8")
+
+
+def iter_parquet(frame, chunk_rows=CHUNK_ROWS * 10):
+    """Parquet（需要 pyarrow），每段寫成一個 row group，逐段產生 bytes"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frame  = _sheet(frame)
+    buf    = io.BytesIO()
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    with pq.ParquetWriter(buf, schema) as writer:
+        for i in range(0, max(len(frame), 1), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(frame.iloc[i:i + chunk_rows], schema=schema, preserve_index=False))
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()   # 檔尾的 metadata
+
+
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """RFC 5545：每行最多 75 位元組，續行以空白開頭；不切斷 UTF-8 字元"""
+    out, cur, size = [], "", 0
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > 75:
+            out.append(cur)
+            cur, size = " ", 1
+        cur, size = cur + ch, size + n
+    out.append(cur)
+    return "\r\n".join(out) + "\r\n"
+
+
+def _day(ts):
+    return ts.strftime("%Y%m%d")
+
+
+def _first_post(start, end, mask):
+    """start ~ end 間第一個符合星期遮罩的日子，沒有則為 None"""
+    for i in range(7):
+        day = start + pd.Timedelta(days=i)
+        if day > end:
+            return None
+        if mask & (1 << day.dayofweek):
+            return day
+    return None
+
+
+def vevent(row, stamp):
+    """一個活動的 VEVENT 各行；常態活動為每個發文日一天的重複事件，其他為整段期間的全天事件"""
+    name, start, end = str(row["活動名稱"]), row["開始日期"], row["結束日期"]
+    if pd.isna(start) or pd.isna(end):
+        return []
+    mask  = int(row.get("星期遮罩", 0) or 0)
+    uid   = hashlib.sha1(f"{name}|{_day(start)}".encode("utf-8")).hexdigest()
+    lines = ["BEGIN:VEVENT", f"UID:{uid}@money-marketing-room", f"DTSTAMP:{stamp}"]
+    if row.get("類型") == "常態" and mask:
+        first = _first_post(start, end, mask)
+        if first is None:
+            return []
+        rule = "FREQ=DAILY" if mask == ALL_DAYS else \
+            "FREQ=WEEKLY;BYDAY=" + ",".join(BYDAY[d] for d in range(7) if mask & (1 << d))
+        lines += [f"DTSTART;VALUE=DATE:{_day(first)}", f"DTEND;VALUE=DATE:{_day(first + pd.Timedelta(days=1))}",
+                  f"RRULE:{rule};UNTIL={_day(end)}"]
+    else:
+        lines += [f"DTSTART;VALUE=DATE:{_day(start)}", f"DTEND;VALUE=DATE:{_day(end + pd.Timedelta(days=1))}"]
+    desc = [f"{col}：{row[col]}" for col in ("刊登平台", "呈現形式", "負責人", "文案重點", "活動狀態")
+            if col in row and pd.notna(row[col]) and str(row[col])]
+    lines += [f"SUMMARY:{_escape(name)}", f"DESCRIPTION:{_escape(chr(10).join(desc))}",
+              f"CATEGORIES:{_escape(row.get('類型', ''))}",
+              f"STATUS:{ICS_STATUS.get(row.get('活動狀態'), 'CONFIRMED')}"]
+    url = str(row.get("相關連結", "") or "")
+    if url.startswith("http"):
+        lines.append(f"URL:{url}")
+    return lines + ["END:VEVENT"]
+
+
+def iter_ics(schedule, states=None, name="馬尼行銷活動"):
+    """iCalendar（需有「星期遮罩」欄）；states 限定活動狀態，None 為全部"""
+    if states is not None:
+        schedule = schedule[schedule["活動狀態"].isin(states)]
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    head  = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//money-marketing-room//marketing schedule//ZH",
+             "CALSCALE:GREGORIAN", "METHOD:PUBLISH", f"X-WR-CALNAME:{_escape(name)}", "X-WR-TIMEZONE:Asia/Taipei"]
+    yield "".join(map(_fold, head)).encode("utf-8")
+    for i in range(0, len(schedule), CHUNK_ROWS):
+        events = (vevent(row, stamp) for row in schedule.iloc[i:i + CHUNK_ROWS].to_dict("records"))
+        yield "".join(_fold(line) for lines in events for line in lines).encode("utf-8")
+    yield _fold("END:VCALENDAR").encode("utf-8")
+
+
+def iter_export(fmt, frame, **kwargs):
+    return {"csv": iter_csv, "parquet": iter_parquet, "ics": iter_ics}[fmt](frame, **kwargs)
+
+
+def write_chunks(chunks, fp):
+    for chunk in chunks:
+        fp.write(chunk)
+
+
+class ExportCache:
+    """依（資料版本, 名稱）快取匯出檔：第一次要求時逐段寫入暫存檔，之後直接回傳同一個路徑。
+    每個名稱只保留最新的 keep 個版本，較舊的檔案刪除。"""
+
+    def __init__(self, directory=None, keep=2):
+        self.directory = directory or tempfile.mkdtemp(prefix="marketing-export-")
+        self.keep      = keep
+        self._files    = {}   # {名稱: [(版本, 路徑), ...]}，依版本排序
+        self._lock     = threading.Lock()
+
+    def path(self, version, name, chunks):
+        """chunks 為無參數函式，回傳逐段 bytes 的疊代器；只有快取沒有時才呼叫"""
+        with self._lock:
+            files = self._files.setdefault(name, [])
+            for v, path in files:
+                if v == version:
+                    return path
+            path = os.path.join(self.directory, f"{version}-{name}")
+            with open(path + ".part", "wb") as fp:
+                write_chunks(chunks(), fp)
+            os.replace(path + ".part", path)
+            files.append((version, path))
+            files.sort()
+            while len(files) > self.keep:
+                os.remove(files.pop(0)[1])
+            return path
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+
+
+def main(argv=None):
+    from .load import load_snapshot
+    from .storage import WORKSHEETS, make_storage
+
+    ap = argparse.ArgumentParser(description="馬尼行銷活動進程：匯出行程 / 任務")
+    ap.add_argument("format", choices=list(FORMATS))
+    ap.add_argument("--sheet", default="Marketing_Schedule", choices=list(WORKSHEETS),
+                    help="要匯出的工作表（ics 固定為 Marketing_Schedule）")
+    ap.add_argument("--states", nargs="*", default=None, help="ics 只含這些活動狀態，例如 企畫中 執行中")
+    ap.add_argument("--out", default="-", help="輸出檔案路徑，- 為標準輸出")
+    ap.add_argument("--storage", default=os.environ.get("MARKETING_STORAGE", "gsheets"),
+                    help="儲存後端：gsheets 或 sqlite:///路徑（預設讀環境變數 MARKETING_STORAGE）")
+    args = ap.parse_args(argv)
+
+    sheet  = "Marketing_Schedule" if args.format == "ics" else args.sheet
+    try:
+        frame = load_snapshot(make_storage(args.storage), [sheet], fallbacks=False).frames[sheet]
+    except Exception as e:   # 讀不到就不產生檔案，避免把空表當成匯出結果
+        sys.exit(f"讀取 {sheet} 失敗：{e}")
+    chunks = iter_ics(frame, args.states) if args.format == "ics" else iter_export(args.format, frame)
+    if args.out == "-":
+        write_chunks(chunks, sys.stdout.buffer)
+    else:
+        with open(args.out, "wb") as fp:
+            write_chunks(chunks, fp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""情報室的時間軸圖（活動行程表、年度甘特圖）。
+
+活動少時沿用 px.timeline 一列一個活動；超過 ROW_LIMIT 列時改成以負責人或刊登平台分列、
+用 WebGL（Scattergl）畫線段，圖高與輸出大小不再隨活動數成長。線段仍超過 SEGMENT_LIMIT 時，
+同一列同一狀態重疊的區間合併成一段。plotly 在第一次畫圖時才匯入。
+"""
+import numpy as np
+import pandas as pd
+
+ROW_LIMIT     = 60     # 超過此列數改為分組 + WebGL
+SEGMENT_LIMIT = 2000   # 分組後線段數上限，超過時合併重疊區間
+ROW_HEIGHT    = 50
+LANE_HEIGHT   = 36
+MIN_HEIGHT    = 400
+MAX_HEIGHT    = 1200
+LANES         = ("活動名稱", "負責人", "刊登平台")
+
+
+def pick_lane(frame, lane=None):
+    """分列依據：未指定時活動少則一列一個活動，多則依負責人"""
+    return lane or ("活動名稱" if len(frame) <= ROW_LIMIT else "負責人")
+
+
+def _merge(part, lanes):
+    """同一列內重疊的區間合併：回傳 (列, 開始, 結束, 活動數)"""
+    seg = pd.DataFrame({"lane": lanes, "s": part["開始日期"], "e": part["結束日期"]}).sort_values(["lane", "s"])
+    reach = seg.groupby("lane", sort=False)["e"].cummax()
+    new   = (seg["lane"] != seg["lane"].shift()) | (seg["s"] > reach.groupby(seg["lane"]).shift())
+    seg["run"] = new.cumsum()
+    out = seg.groupby("run").agg(lane=("lane", "first"), s=("s", "min"), e=("e", "max"), n=("s", "size"))
+    return out["lane"].to_numpy(), out["s"].to_numpy(), out["e"].to_numpy(), out["n"].to_numpy()
+
+
+def _interleave(a, b):
+    """[a0, b0, None, a1, b1, None, ...]：一條 Scattergl 畫多段不相連的線"""
+    out = [None] * (len(a) * 3)
+    out[0::3], out[1::3] = list(a), list(b)
+    return out
+
+
+def _day(values):
+    return pd.DatetimeIndex(values).strftime("%Y-%m-%d")
+
+
+def lanes_figure(frame, lane, color="活動狀態", hover=("刊登平台",)):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    frame  = frame.dropna(subset=["開始日期", "結束日期"])
+    lanes  = frame[lane].astype(str).replace("", "（未指定）")
+    merge  = len(frame) > SEGMENT_LIMIT
+    colors = px.colors.qualitative.Plotly
+    fig    = go.Figure()
+    for i, (status, part) in enumerate(frame.groupby(color, observed=True, sort=False)):
+        if merge:
+            ln, s, e, n = _merge(part, lanes[part.index])
+            text   = [f"{l}：{k} 個活動" for l, k in zip(ln, n)]
+            custom = None
+        else:
+            ln, s, e = lanes[part.index].to_numpy(), part["開始日期"].to_numpy(), part["結束日期"].to_numpy()
+            text   = part["活動名稱"].astype(str)
+            for col in hover:
+                if col in part.columns:
+                    text = text + f"<br>{col}：" + part[col].astype(str)
+            text   = text.tolist()
+            pairs  = [[u, nm] for u, nm in zip(part["相關連結"].astype(str), part["活動名稱"].astype(str))] \
+                if "相關連結" in part.columns else None
+            custom = pairs and _interleave(pairs, pairs)
+        fig.add_trace(go.Scattergl(
+            x=_interleave(_day(s), _day(e)), y=_interleave(ln, ln), text=_interleave(text, text),
+            customdata=custom, mode="lines", name=str(status), hoverinfo="text",
+            line=dict(width=14, color=colors[i % len(colors)])))
+    n_lanes = lanes.nunique()
+    fig.update_yaxes(autorange="reversed", type="category", categoryorder="category ascending")
+    fig.update_layout(height=int(np.clip(n_lanes * LANE_HEIGHT + 120, MIN_HEIGHT, MAX_HEIGHT)), showlegend=True)
+    return fig
+
+
+def timeline_figure(fdf, start, end, mobile_mode, lane=None):
+    """活動行程表：start ~ end 區間內的活動"""
+    import plotly.express as px
+
+    lane = pick_lane(fdf, lane)
+    if lane == "活動名稱" and len(fdf) <= ROW_LIMIT:
+        fig = px.timeline(fdf, x_start="開始日期", x_end="結束日期", y="活動名稱", color="活動狀態", text="活動名稱",
+                          hover_data={"活動名稱": False, "刊登平台": True, "文案重點": True},
+                          custom_data=["相關連結", "活動名稱"])
+        fig.update_traces(textposition='inside', insidetextanchor='start')
+        fig.update_yaxes(autorange="reversed")
+        fig.update_layout(height=max(MIN_HEIGHT, len(fdf) * ROW_HEIGHT))
+    else:
+        fig = lanes_figure(fdf, lane)
+    fig.update_xaxes(range=[start, end], tickformat="%d", dtick="D3" if mobile_mode else "D1",
+                     side="top", tickangle=0 if mobile_mode else -45, tickfont=dict(size=11))
+    ls = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1) if mobile_mode else {}
+    fig.update_layout(showlegend=True, legend=ls)
+    return fig
+
+
+def gantt_figure(cdf, today, mobile_mode, lane=None):
+    """年度甘特圖：全部行銷案"""
+    import plotly.express as px
+
+    lane = pick_lane(cdf, lane)
+    if lane == "活動名稱" and len(cdf) <= ROW_LIMIT:
+        fig = px.timeline(cdf, x_start="開始日期", x_end="結束日期", y="活動名稱",
+                          color="活動狀態", hover_data=["刊登平台", "負責人"])
+        fig.update_yaxes(autorange="reversed")
+    else:
+        fig = lanes_figure(cdf, lane, hover=("刊登平台", "負責人"))
+    fig.update_layout(title="年度活動檔期")
+    fig.update_xaxes(tickformat="%Y/%m/%d", dtick="M3" if mobile_mode else "M1", ticklabelmode="period")
+    fig.add_vline(x=today.timestamp() * 1000, line_width=2, line_dash="dash", line_color="red")
+    return fig
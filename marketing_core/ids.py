@@ -0,0 +1,59 @@
+"""任務ID / 成員ID 分配：記憶體中的高水位＋（選用）鎖檔＋呼叫端提供的資料下限。
+
+同一台主機上的程序以鎖檔互斥；直接在試算表上新增的列只能靠下限函式看到，因此下限應在分配前
+重新讀取後端（App 以 ttl=0 讀取）。讀取之後到新列寫入之前仍有一小段時間，這段期間有人直接在試算表
+加入同前綴的新編號時仍可能重複——這是已知的限制。
+"""
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:   # Windows：只做程序內的同步
+    fcntl = None
+
+
+def max_id(series, prefix):
+    """欄位中形如 prefix + 數字 的最大編號，沒有則為 0"""
+    nums = series.astype(str).str.extract(rf'{prefix}(\d+)')[0].dropna().astype(int)
+    return int(nums.max()) if not nums.empty else 0
+
+
+def format_id(prefix, n):
+    return f"{prefix}{n:03d}"
+
+
+class IdAllocator:
+    """依前綴（T / M）分配連號，一次保留一整段，同一程序內所有 session 共用。
+
+    floors    : {前綴: 無參數函式}，回傳目前資料中已知的最大編號（呼叫端在分配前重新讀取後端取得）；
+                無法確定時（例如資料讀取失敗）應丟出例外，reserve() 不會分配任何編號
+    state_path: 選用的狀態檔；設定後以檔案鎖在同一台主機的多個程序之間同步高水位
+    """
+
+    def __init__(self, floors, state_path=None):
+        self.floors     = floors
+        self.state_path = state_path
+        self._high      = {}
+        self._lock      = threading.Lock()
+
+    def reserve(self, prefix, n=1):
+        """保留 n 個連續編號並回傳 ID 清單；同一編號不會被發出兩次"""
+        with self._lock:
+            if self.state_path and fcntl:
+                with open(self.state_path, "a+", encoding="utf-8") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    f.seek(0)
+                    state = json.loads(f.read() or "{}")
+                    start = self._next(prefix, state.get(prefix, 0))
+                    state[prefix] = start + n - 1
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+            else:
+                start = self._next(prefix, 0)
+            self._high[prefix] = start + n - 1
+        return [format_id(prefix, i) for i in range(start, start + n)]
+
+    def _next(self, prefix, shared_high):
+        return max(self._high.get(prefix, 0), shared_high, self.floors[prefix]()) + 1
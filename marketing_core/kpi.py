@@ -0,0 +1,27 @@
+"""指揮中心 KPI 與任務ID 等不依賴 Streamlit 的計算"""
+from .constants import WEEKDAY_MAP
+from .ids import format_id, max_id
+from .schedule import routine_on
+
+
+def executing(d):
+    return d[d['活動狀態'].str.contains("執行中", na=False)]
+
+
+def compute_kpi(df, today, intervals):
+    plan_df = df[df['活動狀態'].str.contains("企畫中", na=False)]
+    active  = executing(intervals.active_on(today))
+    in_7    = executing(intervals.ending_within(today, 7))
+    in_3    = executing(intervals.ending_within(today, 3))
+    wd      = WEEKDAY_MAP[today.dayofweek]
+    routine = routine_on(active, today)
+    return dict(active_count=len(active), expire_7=len(in_7), expire_3=len(in_3),
+                today_routine=len(routine), plan_count=len(plan_df),
+                in_7_df=in_7, in_3_df=in_3, active_df=active, routine_df=routine, weekday_str=wd)
+
+
+def next_task_id(tasks_df):
+    """產生下一個任務 ID，格式 T001（只看傳入的資料；實際寫入請用 IdAllocator）"""
+    if tasks_df.empty or '任務ID' not in tasks_df.columns:
+        return "T001"
+    return format_id("T", max_id(tasks_df['任務ID'], "T") + 1)
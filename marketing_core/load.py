@@ -0,0 +1,62 @@
+"""從儲存後端讀進三張工作表並解析成快照；App 的背景更新器與命令列共用同一套解析"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .schedule import DateIntervals, weekday_mask
+from .schema import SCHEMAS
+from .snapshot import Snapshot
+from .sop import SopIndex
+from .storage import WORKSHEETS
+
+
+def parse_schedule(df):
+    df = SCHEMAS["Marketing_Schedule"].normalize(df)
+    df['星期遮罩'] = weekday_mask(df)
+    return df
+
+
+def parse_tasks(tasks):
+    return SCHEMAS["Campaign_Tasks"].normalize(tasks)
+
+
+def parse_members(members):
+    # 快照保留離職成員（成員ID 不可重複使用），頁面只看在職的
+    return SCHEMAS["Team_Members"].normalize(members)
+
+
+# Campaign_Tasks / Team_Members 讀不到時以空表代替，不影響其他頁面
+def empty_tasks():
+    return SCHEMAS["Campaign_Tasks"].empty()
+
+
+def empty_members():
+    return SCHEMAS["Team_Members"].empty()
+
+
+PARSERS   = {"Marketing_Schedule": parse_schedule, "Campaign_Tasks": parse_tasks, "Team_Members": parse_members}
+FALLBACKS = {"Campaign_Tasks": empty_tasks, "Team_Members": empty_members}
+DERIVE    = {"Marketing_Schedule": DateIntervals, "Campaign_Tasks": SopIndex}
+
+
+def loaders(store, worksheets=WORKSHEETS):
+    """{工作表: 無參數函式}：讀取（ttl=0 略過連線層快取）後立即解析"""
+    return {ws: (lambda ws=ws: PARSERS[ws](store.read_worksheet(ws, ttl=0))) for ws in worksheets}
+
+
+def load_snapshot(store, worksheets=WORKSHEETS, fallbacks=True):
+    """一次性平行讀取並建好索引的 Snapshot，不啟動背景更新（命令列、排程用）。
+    fallbacks=False 時任何一張表讀不到都直接丟出例外，不以空表代替（輸出檔案的命令列工具用）"""
+    def load(ws, fn):
+        try:
+            return fn()
+        except Exception:
+            if not fallbacks or ws not in FALLBACKS:
+                raise
+            return FALLBACKS[ws]()
+
+    with ThreadPoolExecutor(max_workers=len(worksheets)) as pool:
+        futures = {ws: pool.submit(load, ws, fn) for ws, fn in loaders(store, worksheets).items()}
+        frames  = {ws: f.result() for ws, f in futures.items()}
+    now = datetime.now()
+    return Snapshot(1, frames, {ws: DERIVE[ws](f) if ws in DERIVE else None for ws, f in frames.items()},
+                    {ws: now for ws in frames})
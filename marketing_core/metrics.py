@@ -0,0 +1,144 @@
+"""效能量測：每次重跑的各階段耗時，以及讀寫次數、位元組、快取命中等累計計數"""
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .storage import StorageBackend
+
+
+class Metrics:
+    """程序內共用：runs 保留最近 keep 次重跑的紀錄，counters 為累計計數"""
+
+    def __init__(self, keep=500):
+        self.runs     = deque(maxlen=keep)
+        self.counters = Counter()
+        self._lock    = threading.Lock()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def totals(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def start(self, page):
+        return Run(self, page)
+
+    def summary(self, last=50, page=None):
+        """最近 last 次重跑各階段的 p50 / p95（毫秒）"""
+        runs   = [r for r in list(self.runs) if page in (None, r["page"])][-last:]
+        phases = {}
+        for r in runs:
+            phases.setdefault("（整次重跑）", []).append(r["total"])
+            for name, sec in r["spans"].items():
+                phases.setdefault(name, []).append(sec)
+        return pd.DataFrame([{"階段": name, "次數": len(v),
+                              "p50 (ms)": round(float(np.percentile(v, 50)) * 1000, 1),
+                              "p95 (ms)": round(float(np.percentile(v, 95)) * 1000, 1)}
+                             for name, v in phases.items()], columns=["階段", "次數", "p50 (ms)", "p95 (ms)"])
+
+    def to_jsonl(self):
+        return "\n".join(json.dumps(r, ensure_ascii=False) for r in list(self.runs)) + "\n"
+
+
+class Run:
+    """一次重跑的量測。lap(名稱) 把上一個記錄點到現在的時間記在該階段，span() 量測一段區塊；
+    計數器記錄這次重跑期間累計值的增量（含同時間其他 session 與背景執行緒的讀寫）。"""
+
+    def __init__(self, metrics, page):
+        self.metrics = metrics
+        self.page    = page
+        self.spans   = {}
+        self.started = datetime.now()
+        self._base   = metrics.totals()
+        self._t0     = self._last = time.perf_counter()
+        self._done   = False
+
+    def _add(self, name, sec):
+        self.spans[name] = self.spans.get(name, 0.0) + sec
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self._add(name, now - self._last)
+        self._last = now
+
+    @contextmanager
+    def span(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - t0)
+            self._last = time.perf_counter()
+
+    def finish(self):
+        """結束並存入 metrics.runs；總時間算到最後一個記錄點（被 st.stop / st.rerun 中斷時也一樣）"""
+        if self._done:
+            return None
+        self._done = True
+        totals = self.metrics.totals()
+        record = {"at": self.started.isoformat(timespec="seconds"), "page": self.page,
+                  "total": round(self._last - self._t0, 6),
+                  "spans": {k: round(v, 6) for k, v in self.spans.items()},
+                  "counters": {k: v - self._base.get(k, 0) for k, v in totals.items() if v != self._base.get(k, 0)}}
+        self.metrics.runs.append(record)
+        return record
+
+
+@contextmanager
+def profiled(sink, top=40):
+    """以 cProfile 分析 with 區塊（開始與結束都在同一個執行緒），離開時——包括 st.stop / st.rerun 等例外中斷——
+    停止分析並把依 cumulative 排序的前 top 名統計文字交給 sink"""
+    import cProfile   # 只有要分析時才匯入
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        with profiler:
+            yield
+    finally:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+        sink(out.getvalue())
+
+
+class MeteredStorage(StorageBackend):
+    """包住實際後端，計算讀寫次數、列數與讀入的位元組（DataFrame 在記憶體中的大小）"""
+
+    def __init__(self, store, metrics):
+        self.store   = store
+        self.metrics = metrics
+
+    def read_worksheet(self, worksheet, ttl=None):
+        frame = self.store.read_worksheet(worksheet, ttl=ttl)
+        self.metrics.count("sheet_reads")
+        self.metrics.count("rows_read", len(frame))
+        self.metrics.count("bytes_read", int(frame.memory_usage(index=False, deep=True).sum()))
+        return frame
+
+    def _write(self, rows):
+        self.metrics.count("sheet_writes")
+        self.metrics.count("rows_written", len(rows))
+
+    def append_rows(self, worksheet, rows):
+        self.store.append_rows(worksheet, rows)
+        self._write(rows)
+
+    def update_rows(self, worksheet, key, rows):
+        self.store.update_rows(worksheet, key, rows)
+        self._write(rows)
+
+    def replace_worksheet(self, worksheet, data):
+        self.store.replace_worksheet(worksheet, data)
+        self._write(data)
+
+    def write_reads(self, op, worksheet, key=None):
+        return self.store.write_reads(op, worksheet, key)
@@ -0,0 +1,250 @@
+"""Google Sheets 配額保護：令牌桶限速、指數退避重試（含隨機抖動）、合併同時進行的相同讀取。
+
+RateLimitedStorage 包住實際後端，讀、寫各用一個令牌桶（預設每分鐘 60 次，與 Sheets API 每位使用者的
+讀寫配額相同），桶空時等待而不是送出注定被拒的請求。遇到 429 / 5xx 時依 base × 2^n 的上限內
+隨機等待（full jitter）後重試；其他錯誤（例如工作表不存在）直接拋出。多個 session 同時讀同一張表時
+只有一個請求真的送出，其他人等它的結果。
+
+FakeQuotaBackend 是本機的假配額：固定時間窗內超過 limit 次就丟 429，搭配 SQLite 後端即可重現配額用盡：
+
+    python -m marketing_core.ratelimit                      # 20 個執行緒同時讀，印出合併與重試的次數
+    MARKETING_FAKE_QUOTA=10 streamlit run marketing_app.py  # App 也可以接上假配額
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .storage import StorageBackend
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_TEXT   = ("429", "RATE_LIMIT_EXCEEDED", "RESOURCE_EXHAUSTED", "Quota exceeded")
+
+
+class QuotaExceeded(Exception):
+    """假後端的 429；真正的 gspread APIError 以 response.status_code 判斷"""
+    status_code = 429
+
+
+def status_of(exc):
+    """例外對應的 HTTP 狀態碼（gspread APIError、requests / googleapiclient 的 HTTPError），沒有則為 None"""
+    for obj in (exc, getattr(exc, "response", None), getattr(exc, "resp", None)):
+        code = getattr(obj, "status_code", None) or getattr(obj, "status", None) or getattr(obj, "code", None)
+        if isinstance(code, int) or (isinstance(code, str) and code.isdigit()):
+            return int(code)
+    return None
+
+
+def is_retryable(exc):
+    status = status_of(exc)
+    if status is not None:
+        return status in RETRY_STATUS
+    return any(t in str(exc) for t in RETRY_TEXT)
+
+
+class TokenBucket:
+    """容量 capacity、每秒補充 rate 個令牌；acquire() 在令牌不足時睡到夠為止，回傳等待的秒數"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate     = rate
+        self.capacity = capacity
+        self.tokens   = float(capacity)
+        self.clock    = clock
+        self.sleep    = sleep
+        self._at      = clock()
+        self._lock    = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._at) * self.rate)
+        self._at    = now
+
+    def acquire(self, n=1):
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                wait = (n - self.tokens) / self.rate
+            self.sleep(wait)
+            waited += wait
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class _Flight:
+    def __init__(self):
+        self.done   = threading.Event()
+        self.result = None
+        self.error  = None
+
+
+class RateLimitedStorage(StorageBackend):
+    """限速、重試與讀取合併的後端包裝；寫入時後端另外送出的讀取（store.write_reads）也從讀取令牌桶扣除。stats 累計：
+    throttled（因桶空而等待的次數）、retries、gave_up（重試用盡）、coalesced（搭便車的讀取）"""
+
+    def __init__(self, store, reads_per_min=60, writes_per_min=60, retries=5, base=0.5, cap=16,
+                 sleep=time.sleep, rng=random.random):
+        self.store   = store
+        self.reads   = TokenBucket(reads_per_min / 60, reads_per_min, sleep=sleep)
+        self.writes  = TokenBucket(writes_per_min / 60, writes_per_min, sleep=sleep)
+        self.retries = retries
+        self.base    = base
+        self.cap     = cap
+        self.sleep   = sleep
+        self.rng     = rng
+        self.stats   = Counter()
+        self._flights = {}
+        self._lock    = threading.Lock()
+
+    def backoff(self, attempt):
+        """第 attempt 次重試前等待的秒數：0 ~ min(cap, base × 2^attempt) 之間均勻隨機"""
+        return self.rng() * min(self.cap, self.base * 2 ** attempt)
+
+    def _call(self, bucket, fn, *args, reads=0):
+        """reads：這次寫入另外送出的讀取呼叫數（store.write_reads），一併從讀取令牌桶扣除"""
+        for attempt in range(self.retries + 1):
+            if bucket.acquire() + (self.reads.acquire(reads) if reads else 0):
+                self.stats["throttled"] += 1
+            try:
+                return fn(*args)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.retries:
+                    if is_retryable(e):
+                        self.stats["gave_up"] += 1
+                    raise
+                self.stats["retries"] += 1
+                self.sleep(self.backoff(attempt))
+
+    def read_worksheet(self, worksheet, ttl=None):
+        key = (worksheet, ttl)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._call(self.reads, self.store.read_worksheet, worksheet, ttl)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def append_rows(self, worksheet, rows):
+        self._call(self.writes, self.store.append_rows, worksheet, rows,
+                   reads=self.store.write_reads("append", worksheet))
+
+    def update_rows(self, worksheet, key, rows):
+        self._call(self.writes, self.store.update_rows, worksheet, key, rows,
+                   reads=self.store.write_reads("update", worksheet, key))
+
+    def replace_worksheet(self, worksheet, data):
+        self._call(self.writes, self.store.replace_worksheet, worksheet, data,
+                   reads=self.store.write_reads("replace", worksheet))
+
+    def write_reads(self, op, worksheet, key=None):
+        return self.store.write_reads(op, worksheet, key)
+
+
+class FakeQuotaBackend(StorageBackend):
+    """本機假配額：每 window 秒最多 limit 個請求（讀寫合計），超過丟 QuotaExceeded；
+    latency 模擬網路延遲，calls / rejected 記錄實際送到後端與被拒的次數"""
+
+    def __init__(self, store, limit=10, window=60.0, latency=0.0):
+        self.store    = store
+        self.limit    = limit
+        self.window   = window
+        self.latency  = latency
+        self.calls    = 0
+        self.rejected = 0
+        self._times   = deque()
+        self._lock    = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._times and self._times[0] <= now - self.window:
+                self._times.popleft()
+            if len(self._times) >= self.limit:
+                self.rejected += 1
+                raise QuotaExceeded("429 Quota exceeded for quota metric 'Read requests' (fake)")
+            self._times.append(now)
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def read_worksheet(self, worksheet, ttl=None):
+        self._admit()
+        return self.store.read_worksheet(worksheet, ttl=ttl)
+
+    def append_rows(self, worksheet, rows):
+        self._admit()
+        self.store.append_rows(worksheet, rows)
+
+    def update_rows(self, worksheet, key, rows):
+        self._admit()
+        self.store.update_rows(worksheet, key, rows)
+
+    def replace_worksheet(self, worksheet, data):
+        self._admit()
+        self.store.replace_worksheet(worksheet, data)
+
+    def write_reads(self, op, worksheet, key=None):
+        return self.store.write_reads(op, worksheet, key)
+
+
+def main(argv=None):
+    import os
+    import tempfile
+
+    from .bench import generate
+    from .storage import WORKSHEETS, SQLiteBackend
+
+    ap = argparse.ArgumentParser(description="以假配額後端檢查限速、重試與讀取合併")
+    ap.add_argument("--threads", type=int, default=20, help="同時讀取的執行緒數")
+    ap.add_argument("--rounds", type=int, default=3, help="每個執行緒讀幾輪三張表")
+    ap.add_argument("--limit", type=int, default=5, help="假配額：每個時間窗允許的請求數")
+    ap.add_argument("--window", type=float, default=1.0, help="假配額的時間窗（秒）")
+    ap.add_argument("--latency", type=float, default=0.05, help="假後端每個請求的延遲（秒）")
+    args = ap.parse_args(argv)
+
+    sqlite = SQLiteBackend(os.path.join(tempfile.mkdtemp(prefix="marketing-quota-"), "quota.db"))
+    sqlite.restore(generate(1000))
+    fake  = FakeQuotaBackend(sqlite, args.limit, args.window, args.latency)
+    # 限速略高於假配額，讓 429 與退避重試都會發生
+    store = RateLimitedStorage(fake, reads_per_min=args.limit * 60 / args.window * 2, base=0.1, cap=2)
+
+    def worker(_):
+        for _ in range(args.rounds):
+            for ws in WORKSHEETS:
+                store.read_worksheet(ws, ttl=0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(worker, range(args.threads)))
+    requested = args.threads * args.rounds * len(WORKSHEETS)
+    print(f"讀取要求 {requested} 次，{time.perf_counter() - t0:.1f}s 全部成功")
+    print(f"  送到後端 {fake.calls} 次（被拒 {fake.rejected} 次）；合併 {store.stats['coalesced']} 次、"
+          f"重試 {store.stats['retries']} 次、限速等待 {store.stats['throttled']} 次")
+
+
+if __name__ == "__main__":
+    main()
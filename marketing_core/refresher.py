@@ -0,0 +1,189 @@
+"""背景更新（stale-while-revalidate）：頁面一律讀最近一次完成的資料，不等待遠端讀取"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from .snapshot import Snapshot
+
+log = logging.getLogger(__name__)
+
+
+class SheetRefresher:
+    """每張工作表一個 loader，結果集中在共用的 Snapshot。背景執行緒在更新間隔到期前重新讀取，
+    成功後以新版本整份替換；失敗時保留舊資料並在 retry 秒後再試。
+
+    loaders  : {工作表: 無參數函式}，回傳該工作表解析好的 DataFrame
+    intervals: {工作表: 更新間隔秒數}
+    jitter   : 0~1，實際間隔在 interval × (1 - jitter) ~ interval 之間隨機，避免多張表同時到期
+    fallbacks: {工作表: 無參數函式}，第一次讀取就失敗時改用的預設資料（例如空表），retry 秒後再試
+    derive   : {工作表: 函式(frame)}，每次該表換新時一併重建的索引，存在 Snapshot.indexes
+    cache_dir: 每次讀取成功就把解析好的表以 Parquet 存一份到這個目錄（須為本使用者私有，權限 0700）；程序剛啟動、記憶體裡還沒有資料時讀取失敗
+               （例如 API 配額用盡），先用這份最後成功的資料，retry 秒後再試
+    overlay  : 函式(工作表, frame) → frame，讀取結果換上快照前套上還沒寫回後端的變更（WriteQueue.overlay），
+               避免樂觀更新被較舊的伺服器資料蓋回；fetched 仍保留未套用的原始讀取結果
+
+    多張工作表同時要讀時交給執行緒池平行讀取，每個 worker 讀完立即解析，
+    解析與其他工作表的網路等待互相重疊；timings 記錄每張表最近一次的讀取＋解析秒數。
+    errors 記錄目前讀不到的工作表 {工作表: (失敗時間, 例外)}，成功讀取後移除，頁面據此顯示資料過時的提示。
+    """
+
+    def __init__(self, loaders, intervals, jitter=0.1, retry=60, fallbacks=None, derive=None, cache_dir=None,
+                 overlay=None):
+        self.loaders   = loaders
+        self.intervals = intervals
+        self.fallbacks = fallbacks or {}
+        self.derive    = derive or {}
+        self.jitter    = jitter
+        self.retry     = retry
+        self.timings   = {}
+        self.errors    = {}
+        self.cache_dir = cache_dir
+        self.overlay   = overlay
+        self.snapshot  = Snapshot()
+        self.fetched   = {}   # {工作表: 最近一次從後端讀到的 frame}，不含之後套用的寫入
+        self._writes   = {}   # {工作表: 已套用的寫入次數}，用來丟棄讀取期間發生寫入的舊結果
+        self._due      = {}
+        self._pool     = ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="sheet-load")
+        self._locks    = {ws: threading.Lock() for ws in loaders}
+        self._swap     = threading.Lock()
+        self._wake     = threading.Event()
+        self._thread   = None
+
+    def _index(self, ws, frame):
+        return self.derive[ws](frame) if ws in self.derive else None
+
+    def _cache_path(self, ws):
+        return os.path.join(self.cache_dir, f"{ws}.parquet")
+
+    def _private_dir(self):
+        """建立（或確認）只有本程序使用者可存取的 cache_dir；不符合時不保存也不讀取"""
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        st = os.stat(self.cache_dir)
+        if (hasattr(os, "getuid") and st.st_uid != os.getuid()) or st.st_mode & 0o077:
+            log.error("%s 不是本使用者私有的目錄（擁有者或權限不符），不使用最後成功資料", self.cache_dir)
+            return False
+        return True
+
+    def _save(self, ws, frame):
+        if not self.cache_dir:
+            return
+        try:
+            if self._private_dir():
+                frame.to_parquet(self._cache_path(ws) + ".part", index=False)
+                os.replace(self._cache_path(ws) + ".part", self._cache_path(ws))
+        except Exception:
+            log.exception("保存 %s 的最後成功資料失敗", ws)
+
+    def _last_good(self, ws):
+        """(frame, 保存時間)；沒有或讀不出來時為 (None, None)"""
+        if not self.cache_dir or not os.path.exists(self._cache_path(ws)):
+            return None, None
+        try:
+            if not self._private_dir():
+                return None, None
+            path = self._cache_path(ws)
+            return pd.read_parquet(path), datetime.fromtimestamp(os.path.getmtime(path))
+        except Exception:
+            log.exception("讀取 %s 的最後成功資料失敗", ws)
+            return None, None
+
+    def _load(self, ws, force):
+        with self._locks[ws]:
+            if not force and ws in self.snapshot.frames:
+                return
+            seq = self._writes.get(ws, 0)
+            t0  = time.perf_counter()
+            at  = None
+            try:
+                frame = self.loaders[ws]()
+                due   = time.time() + self.intervals.get(ws, 600) * (1 - self.jitter * random.random())
+                self.timings[ws] = time.perf_counter() - t0
+                self.errors.pop(ws, None)
+                self._save(ws, frame)
+            except Exception as e:
+                self.errors[ws] = (datetime.now(), e)
+                if ws in self.snapshot.frames:
+                    raise
+                frame, at = self._last_good(ws)
+                if frame is not None:
+                    log.warning("讀取 %s 失敗，改用 %s 保存的資料：%s", ws, f"{at:%Y-%m-%d %H:%M}", e)
+                elif ws in self.fallbacks:
+                    log.exception("讀取 %s 失敗，暫用預設資料", ws)
+                    frame = self.fallbacks[ws]()
+                else:
+                    raise
+                due = time.time() + self.retry
+            shown = self.overlay(ws, frame) if self.overlay else frame
+            index = self._index(ws, shown)
+            with self._swap:
+                if self._writes.get(ws, 0) != seq:
+                    # 讀取期間有寫入套用到快照，這份結果可能不含該筆寫入：丟棄並儘快重讀
+                    due = time.time() + 1
+                else:
+                    self.snapshot    = self.snapshot.replace(ws, shown, index, at or datetime.now())
+                    self.fetched[ws] = frame
+                self._due[ws] = due
+        self._wake.set()
+
+    def _load_many(self, worksheets, force):
+        """平行讀取；各表各自成功或失敗，全部結束後回傳 {工作表: 例外}"""
+        futures = {ws: self._pool.submit(self._load, ws, force) for ws in worksheets}
+        return {ws: f.exception() for ws, f in futures.items() if f.exception() is not None}
+
+    def _raise_first(self, errors):
+        if errors:
+            raise next(iter(errors.values()))
+
+    def ensure_loaded(self, *worksheets):
+        """還沒讀過的工作表（不指定則全部）一起平行讀取"""
+        missing = [ws for ws in worksheets or self.loaders if ws not in self.snapshot.frames]
+        self._raise_first(self._load_many(missing, force=False))
+
+    def get(self, ws):
+        """最近一次完成的資料；只有第一次讀取時會同步等待"""
+        if ws not in self.snapshot.frames:
+            self._load(ws, force=False)
+        return self.snapshot.frames[ws]
+
+    def loaded_at(self, ws):
+        return self.snapshot.loaded_at.get(ws)
+
+    def apply(self, ws, fn):
+        """把已寫入後端的變動套用到快照：fn(目前的 frame) 回傳新 frame（不可修改傳入的 frame），
+        重建該表索引後換成新版本，其他工作表不受影響"""
+        with self._swap:
+            self._writes[ws] = self._writes.get(ws, 0) + 1
+            frame = fn(self.snapshot.frames[ws])
+            self.snapshot = self.snapshot.replace(ws, frame, self._index(ws, frame))
+
+    def touch(self, ws):
+        """後端剛有寫入（例如延遲寫入送出）：在這之前開始的讀取結果作廢"""
+        with self._swap:
+            self._writes[ws] = self._writes.get(ws, 0) + 1
+
+    def refresh(self, *worksheets):
+        """立即同步重新讀取（不指定則全部），用於手動刷新"""
+        self._raise_first(self._load_many(worksheets or list(self.loaders), force=True))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sheet-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            now    = time.time()
+            errors = self._load_many([ws for ws, due in list(self._due.items()) if due <= now], force=True)
+            for ws, e in errors.items():
+                log.error("背景更新 %s 失敗，沿用舊資料：%s", ws, e)
+                self._due[ws] = now + self.retry
+            self._wake.clear()
+            wait = min(self._due.values(), default=now + self.retry) - time.time()
+            self._wake.wait(max(wait, 1))
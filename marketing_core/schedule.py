@@ -0,0 +1,90 @@
+"""Marketing_Schedule 的日期與週期運算"""
+import numpy as np
+import pandas as pd
+
+from .constants import WEEKDAY_MAP
+
+ALL_DAYS = 0b1111111
+
+
+def weekday_mask(df):
+    """週期模式 / 重複星期 → 7 位元星期遮罩（bit 0 = 週一 … bit 6 = 週日），每日為全部位元"""
+    mask = pd.Series(0, index=df.index, dtype="int16")
+    if '重複星期' in df.columns:
+        text = df['重複星期'].astype(str)
+        for d, label in WEEKDAY_MAP.items():
+            mask |= text.str.contains(label, regex=False).astype("int16") * (1 << d)
+    if '週期模式' in df.columns:
+        mask[df['週期模式'] == '每日'] = ALL_DAYS
+    return mask.astype("int8")
+
+
+def routine_on(df, day):
+    """day 當天要發文的常態活動（需有 load_data 產生的「星期遮罩」欄）"""
+    bit = 1 << day.dayofweek
+    return df[(df['類型']=='常態') & (df['開始日期']<=day) & (df['結束日期']>=day) & ((df['星期遮罩'] & bit) != 0)]
+
+
+class DateIntervals:
+    """(開始日期, 結束日期) 區間索引：依結束日期排序，以二分搜尋回答日期區間查詢。
+
+    查詢只需檢查結束日期落在查詢起點之後的活動，歷史活動再多也不影響成本。
+    結果維持原始資料列順序；日期為空的列與逐列比較一樣不會被查到。
+    """
+
+    def __init__(self, df):
+        self.df      = df
+        pos          = np.flatnonzero(df['結束日期'].notna().to_numpy())
+        ends         = df['結束日期'].to_numpy()[pos]
+        order        = np.argsort(ends, kind="stable")
+        self._pos    = pos[order]
+        self._ends   = ends[order]
+        self._starts = df['開始日期'].to_numpy()[self._pos]
+
+    def _rows(self, pos):
+        return self.df.iloc[np.sort(pos)]
+
+    def overlapping(self, start, end):
+        """與 [start, end] 有交集的活動"""
+        i = np.searchsorted(self._ends, pd.Timestamp(start).to_datetime64(), side="left")
+        return self._rows(self._pos[i:][self._starts[i:] <= pd.Timestamp(end).to_datetime64()])
+
+    def active_on(self, day):
+        """day 當天進行中的活動"""
+        return self.overlapping(day, day)
+
+    def ending_within(self, day, days):
+        """結束日期落在 [day, day + days 天] 的活動"""
+        day = pd.Timestamp(day)
+        i   = np.searchsorted(self._ends, day.to_datetime64(), side="left")
+        j   = np.searchsorted(self._ends, (day + pd.Timedelta(days=days)).to_datetime64(), side="right")
+        return self._rows(self._pos[i:j])
+
+
+def occurrences(df, start, end):
+    """常態活動在 [start, end] 內的每一個發文日，所有活動 × 日期一次以矩陣運算展開。
+
+    回傳每個發文日一列：「發文日」加上該活動的原始欄位，依發文日、再依原始列順序排列。
+    與對每一天呼叫 routine_on 的結果相同（需有「星期遮罩」欄）。
+    """
+    routine = df[df['類型']=='常態']
+    days    = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D")
+    if routine.empty or days.empty:
+        return routine.iloc[:0].assign(發文日=pd.Series(dtype="datetime64[ns]"))[['發文日'] + list(routine.columns)]
+    d    = days.to_numpy()[None, :]
+    bits = (1 << days.dayofweek.to_numpy())[None, :]
+    hit  = ((routine['開始日期'].to_numpy()[:, None] <= d) & (routine['結束日期'].to_numpy()[:, None] >= d)
+            & ((routine['星期遮罩'].to_numpy().astype(np.int16)[:, None] & bits) != 0))
+    di, ci = np.nonzero(hit.T)   # 以日期為主序
+    out = routine.iloc[ci].reset_index(drop=True)
+    out.insert(0, '發文日', days[di])
+    return out
+
+
+def daily_counts(occ, start, end, by=None):
+    """每日發文數；by 指定欄位時為 日期 × 該欄位 的表，沒有發文的日子補 0"""
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D")
+    if by is None:
+        return occ.groupby('發文日').size().reindex(days, fill_value=0)
+    return (occ.groupby(['發文日', occ[by].astype(str).replace("", "（未指定）")]).size()
+            .unstack(fill_value=0).reindex(days, fill_value=0))
@@ -0,0 +1,110 @@
+"""各工作表的欄位宣告：載入時一次完成清理、型別轉換與必要欄位檢查
+
+欄位型別：
+- TEXT      ：去除前後空白，空值與 'nan' 變成 ''
+- DATE      ：轉成 datetime64，無法解析的變成 NaT
+- 類別清單   ：低基數欄位轉成 category，固定類別在前；資料中出現清單外的值會附加在後面，不會遺失
+- CATEGORY  ：類別由資料決定（例如負責人）
+"""
+import numpy as np
+import pandas as pd
+
+from .constants import (CAMPAIGN_STATES, CAMPAIGN_TYPES, CYCLE_MODES, MEMBER_ROLES, SOP_STEPS,
+                        TASK_STATUSES)
+
+TEXT     = "text"
+DATE     = "date"
+CATEGORY = ()
+
+
+def _categorical(values, fixed):
+    seen = [v for v in pd.unique(values) if v not in fixed]
+    return pd.Categorical(values, categories=list(fixed) + sorted(seen))
+
+
+def _cleaned(frame):
+    """多個文字欄位一次清理，回傳 2D numpy 字串陣列"""
+    vals = np.char.strip(frame.astype(object).where(frame.notna(), "").astype(str).to_numpy(dtype=str))
+    vals[np.isin(vals, ["nan", "NaN"])] = ""
+    return vals.astype(object)
+
+
+class Schema:
+    """columns : {欄位: TEXT / DATE / CATEGORY / 固定類別清單}
+    required: 缺少就視為讀取失敗的欄位
+    fill    : {欄位: 值}，空白儲存格補上的預設值
+    absent  : {欄位: 值}，整個欄位不存在時補上的值（不給則 TEXT 補 ''、DATE 補 NaT）
+    """
+
+    def __init__(self, name, columns, required=(), fill=None, absent=None):
+        self.name     = name
+        self.columns  = columns
+        self.required = list(required)
+        self.fill     = fill or {}
+        self.absent   = absent or {}
+
+    def normalize(self, raw):
+        """清理並轉型；未宣告的欄位原樣保留"""
+        missing = [c for c in self.required if c not in raw.columns]
+        if missing:
+            raise ValueError(f"{self.name} 缺少必要欄位：{'、'.join(missing)}")
+
+        raw   = raw.copy()
+        for col, kind in self.columns.items():
+            if col not in raw.columns:
+                raw[col] = self.absent.get(col, pd.NaT if kind == DATE else "")
+        texts = [c for c, kind in self.columns.items() if kind != DATE]
+        vals  = _cleaned(raw[texts]) if len(raw) else np.empty((0, len(texts)), dtype=object)
+
+        out = {}
+        for i, col in enumerate(texts):
+            col_vals = vals[:, i]
+            if col in self.fill:
+                col_vals = np.where(col_vals == "", self.fill[col], col_vals)
+            kind = self.columns[col]
+            out[col] = _categorical(col_vals, kind) if kind != TEXT else col_vals
+        for col, kind in self.columns.items():
+            if kind == DATE:
+                out[col] = pd.to_datetime(raw[col], errors="coerce")
+        # 維持工作表原本的欄位順序，缺少而補上的欄位在最後
+        return pd.DataFrame({c: out[c] if c in out else raw[c] for c in raw.columns}, index=raw.index)
+
+    def empty(self):
+        return self.normalize(pd.DataFrame(columns=list(self.columns)))
+
+
+SCHEDULE = Schema(
+    "Marketing_Schedule",
+    {"類型": CAMPAIGN_TYPES, "活動名稱": TEXT, "刊登平台": TEXT, "呈現形式": TEXT,
+     "開始日期": DATE, "結束日期": DATE, "週期模式": CYCLE_MODES, "重複星期": TEXT,
+     "文案重點": TEXT, "負責人": CATEGORY, "相關連結": TEXT, "活動狀態": CAMPAIGN_STATES},
+    required=["活動名稱", "開始日期", "結束日期"],
+    fill={"活動狀態": "企畫中"},
+    absent={"活動狀態": "執行中"},
+)
+
+TASKS = Schema(
+    "Campaign_Tasks",
+    {"任務ID": TEXT, "活動名稱": TEXT, "SOP步驟": SOP_STEPS, "任務說明": TEXT, "負責人": CATEGORY,
+     "審核狀態": TASK_STATUSES, "預計完成日": DATE, "實際完成日": DATE, "備註": TEXT},
+    required=["活動名稱", "SOP步驟", "審核狀態"],
+)
+
+MEMBERS = Schema(
+    "Team_Members",
+    {"成員ID": TEXT, "姓名": TEXT, "職稱": MEMBER_ROLES, "負責範疇": TEXT, "狀態": CATEGORY},
+    required=["姓名", "狀態"],
+)
+
+SCHEMAS = {s.name: s for s in (SCHEDULE, TASKS, MEMBERS)}
+
+
+def concat_frames(frame, rows):
+    """串接兩份同一 schema 的資料；類別欄位取兩邊類別的聯集，避免退化成 object"""
+    for col in frame.columns.intersection(rows.columns):
+        a, b = frame[col], rows[col]
+        if isinstance(a.dtype, pd.CategoricalDtype) and isinstance(b.dtype, pd.CategoricalDtype):
+            cats  = list(a.cat.categories) + [c for c in b.cat.categories if c not in set(a.cat.categories)]
+            frame = frame.assign(**{col: a.cat.set_categories(cats)})
+            rows  = rows.assign(**{col: b.cat.set_categories(cats)})
+    return pd.concat([frame, rows], ignore_index=True)
@@ -0,0 +1,162 @@
+"""全文搜尋：活動與任務文字欄位的倒排索引。
+
+中日韓文字沒有空白分詞，連續的 CJK 字元切成單字與相鄰兩字（bigram），英數字以整個單字為詞（查詢時當作前綴，例如 T00 可找到 T001），
+全形半形與大小寫先經 NFKC 正規化。查詢以同樣規則切詞，所有詞都要出現（bigram 串起來近似片語比對），
+依欄位權重 × idf 加總排序。任務的 任務說明 / 備註 命中時算在同名活動上。
+
+索引跟著資料版本同步：只新增列或少數列改動時只重算那些列，列數變少（刪除、封存）才整個重建。
+"""
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+CAMPAIGN_FIELDS = {"活動名稱": 3.0, "文案重點": 1.0, "刊登平台": 1.0, "呈現形式": 1.0}
+TASK_FIELDS     = {"任務說明": 0.5, "備註": 0.5}
+
+_CJK  = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"   # 假名、漢字、諺文
+_TERM = re.compile(f"([{_CJK}]+)|([0-9a-z]+)")
+
+
+def tokenize(text, query=False):
+    """切詞：CJK 取單字＋bigram（查詢時有 bigram 就只用 bigram），英數字取整個單字"""
+    out = []
+    for cjk, word in _TERM.findall(unicodedata.normalize("NFKC", str(text)).lower()):
+        if word:
+            out.append(word)
+        elif len(cjk) == 1 or not query:
+            out.extend(cjk)
+        if len(cjk) > 1:
+            out.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return out
+
+
+class TextIndex:
+    """單一表格的倒排索引：postings[詞] = {列位置: 權重}"""
+
+    def __init__(self, fields):
+        self.fields   = fields
+        self.postings = defaultdict(dict)
+        self.texts    = np.empty((0, len(fields)), dtype=object)
+        self._vocab   = None   # 排序過的詞表，前綴查詢時才建，索引有新詞時作廢
+
+    def _text(self, frame):
+        cols = {c: frame[c].astype(str).replace({"nan": "", "<NA>": "", "None": ""}).to_numpy(dtype=object)
+                if c in frame.columns else np.full(len(frame), "", dtype=object) for c in self.fields}
+        return np.column_stack(list(cols.values())) if len(frame) else np.empty((0, len(self.fields)), dtype=object)
+
+    def _terms(self, row):
+        weights = defaultdict(float)
+        for text, w in zip(row, self.fields.values()):
+            for term in set(tokenize(text)):
+                weights[term] += w
+        return weights
+
+    def _add(self, pos, row):
+        for term, w in self._terms(row).items():
+            if term not in self.postings:
+                self._vocab = None
+            self.postings[term][pos] = w
+
+    def _remove(self, pos, row):
+        for term in self._terms(row):
+            self.postings[term].pop(pos, None)
+
+    def lookup(self, term):
+        """{列位置: 權重}；英數字詞比對所有以它開頭的詞，同一列取最高權重"""
+        if not term.isascii():
+            return self.postings.get(term, {})
+        if self._vocab is None:
+            self._vocab = sorted(t for t in self.postings if t.isascii())
+        out = {}
+        for t in self._vocab[bisect.bisect_left(self._vocab, term):]:
+            if not t.startswith(term):
+                break
+            for pos, w in self.postings[t].items():
+                out[pos] = max(out.get(pos, 0.0), w)
+        return out
+
+    def sync(self, frame):
+        """與新版本的表同步，回傳重算的列數"""
+        texts, n = self._text(frame), len(self.texts)
+        if len(texts) < n:
+            self.postings.clear()
+            self._vocab = None
+            self.texts, n = np.empty((0, len(self.fields)), dtype=object), 0
+        changed = np.flatnonzero((texts[:n] != self.texts).any(axis=1)) if n else []
+        for pos in changed:
+            self._remove(pos, self.texts[pos])
+            self._add(pos, texts[pos])
+        for pos in range(n, len(texts)):
+            self._add(pos, texts[pos])
+        self.texts = texts
+        return len(changed) + len(texts) - n
+
+
+class SearchIndex:
+    """活動搜尋。sync(snapshot) 每次重跑呼叫即可，版本沒變時不做事；較舊的版本不會蓋掉較新的索引。
+
+    search() 回傳命中的活動列（依相關度排序），加上 相關度 與 任務命中（命中的子任務數）兩欄。
+    """
+
+    def __init__(self):
+        self.version   = -1
+        self.schedule  = None
+        self.campaigns = TextIndex(CAMPAIGN_FIELDS)
+        self.tasks     = TextIndex(TASK_FIELDS)
+        self._by_name  = {}
+        self._task_of  = np.empty(0, dtype=object)
+        self._lock     = threading.Lock()
+
+    def sync(self, snapshot):
+        with self._lock:
+            if snapshot.version <= self.version:
+                return
+            self.campaigns.sync(snapshot.schedule)
+            self.tasks.sync(snapshot.tasks)
+            self.schedule = snapshot.schedule
+            self._by_name = snapshot.schedule.groupby("活動名稱", observed=True, sort=False).indices
+            self._task_of = snapshot.tasks["活動名稱"].astype(str).to_numpy(dtype=object)
+            self.version  = snapshot.version
+
+    def _term_hits(self, term, n_docs):
+        """{活動列位置: 分數}、{活動列位置: 命中任務數}"""
+        hits, task_hits = dict(self.campaigns.lookup(term)), defaultdict(int)
+        for pos, w in self.tasks.lookup(term).items():
+            for c in self._by_name.get(self._task_of[pos], ()):
+                hits[c] = hits.get(c, 0.0) + w
+                task_hits[c] += 1
+        idf = math.log(1 + n_docs / max(len(hits), 1))
+        return {c: w * idf for c, w in hits.items()}, task_hits
+
+    def search(self, query, owner=None, status=None, start=None, end=None, limit=50):
+        """owner：負責人；status：活動狀態清單；start / end：與活動期間有重疊的日期區間"""
+        with self._lock:
+            terms, frame = list(dict.fromkeys(tokenize(query, query=True))), self.schedule
+            if not terms or frame is None or frame.empty:
+                return None if frame is None else frame.iloc[:0].assign(相關度=[], 任務命中=[])
+            score, tasks = None, defaultdict(int)
+            for term in terms:
+                hits, task_hits = self._term_hits(term, len(frame))
+                score = hits if score is None else {c: s + hits[c] for c, s in score.items() if c in hits}
+                for c, k in task_hits.items():
+                    tasks[c] = max(tasks[c], k)
+                if not score:
+                    break
+        pos = np.fromiter(score, dtype=int, count=len(score))
+        out = frame.iloc[pos].assign(相關度=np.round([score[p] for p in pos], 2),
+                                     任務命中=[tasks.get(p, 0) for p in pos])
+        if owner:
+            out = out[out["負責人"] == owner]
+        if status:
+            out = out[out["活動狀態"].isin(status)]
+        if start is not None:
+            out = out[out["結束日期"] >= pd.Timestamp(start)]
+        if end is not None:
+            out = out[out["開始日期"] <= pd.Timestamp(end)]
+        return out.sort_values(["相關度", "開始日期"], ascending=False, kind="stable").head(limit)
@@ -0,0 +1,57 @@
+"""共用資料快照：所有使用者讀同一份唯讀資料，變動一律以 copy-on-write 產生新版本"""
+import threading
+from collections import Counter
+
+
+class Snapshot:
+    """某一版本的完整資料集；frames / indexes / loaded_at 都是 {工作表: ...}。
+
+    建好之後不再修改，頁面可直接讀取、不必複製；任何變動都經由 replace() 產生下一版，
+    沒變動的工作表與索引沿用同一個物件。stats 記錄 memo 的命中 / 未命中次數，跨版本共用同一個 Counter。
+    """
+
+    def __init__(self, version=0, frames=None, indexes=None, loaded_at=None, stats=None):
+        self.version   = version
+        self.frames    = frames or {}
+        self.indexes   = indexes or {}
+        self.loaded_at = loaded_at or {}
+        self.stats     = Counter() if stats is None else stats
+        self._memo     = {}
+        self._lock     = threading.Lock()
+
+    def replace(self, ws, frame, index=None, loaded_at=None):
+        """換掉一張工作表（及其索引）後的新版本；loaded_at 不給則沿用原本的載入時間"""
+        return Snapshot(self.version + 1,
+                        {**self.frames, ws: frame},
+                        {**self.indexes, ws: index},
+                        {**self.loaded_at, ws: loaded_at or self.loaded_at.get(ws)}, self.stats)
+
+    def memo(self, key, fn):
+        """以這個版本的資料計算 fn(self) 一次並記住，供跨工作表的衍生資料使用"""
+        with self._lock:
+            if key not in self._memo:
+                self.stats["memo_miss"] += 1
+                self._memo[key] = fn(self)
+            else:
+                self.stats["memo_hit"] += 1
+            return self._memo[key]
+
+    @property
+    def schedule(self):
+        return self.frames["Marketing_Schedule"]
+
+    @property
+    def tasks(self):
+        return self.frames["Campaign_Tasks"]
+
+    @property
+    def members(self):
+        return self.frames["Team_Members"]
+
+    @property
+    def intervals(self):
+        return self.indexes["Marketing_Schedule"]
+
+    @property
+    def sop_index(self):
+        return self.indexes["Campaign_Tasks"]
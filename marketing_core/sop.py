@@ -0,0 +1,59 @@
+"""活動 × SOP 步驟狀態索引：每次載入資料建一次，卡片查詢為 O(1)"""
+import pandas as pd
+
+from .constants import SOP_STEPS, STATUS_DONE
+
+EMPTY_STEP = {"status": "—", "owner": ""}
+EMPTY_SOP  = {step: EMPTY_STEP for step in SOP_STEPS}
+
+
+class SopIndex:
+    """status[活動名稱][SOP步驟] = {"status", "owner"}；pct[活動名稱] = SOP 完成度 (%)
+
+    同一活動同一步驟有多筆子任務時取第一筆，與逐筆掃描的舊行為一致。
+    """
+
+    def __init__(self, tasks_df):
+        self.status = {}
+        self.pct    = {}
+        if tasks_df.empty:
+            return
+        sub = tasks_df[tasks_df['SOP步驟'].isin(SOP_STEPS)].drop_duplicates(['活動名稱','SOP步驟'], keep='first')
+        for name, step, status, owner in zip(sub['活動名稱'], sub['SOP步驟'], sub['審核狀態'], sub['負責人']):
+            self.status.setdefault(name, dict(EMPTY_SOP))[step] = {"status": status, "owner": owner}
+        done = sub['審核狀態'].isin(STATUS_DONE).groupby(sub['活動名稱']).sum()
+        self.pct = {name: int(cnt / len(SOP_STEPS) * 100) for name, cnt in done.items()}
+
+    def get(self, campaign_name):
+        return self.status.get(campaign_name, EMPTY_SOP)
+
+
+def get_sop_status(campaign_name, sop_index):
+    return sop_index.get(campaign_name)
+
+
+def sop_progress_pct(sop_dict):
+    return int(sum(1 for v in sop_dict.values() if v["status"] in STATUS_DONE) / len(SOP_STEPS) * 100)
+
+
+def sop_task_rows(campaign_name, sop_assignments, start_date, task_ids):
+    """新活動的 SOP 子任務（每個步驟一列，預計完成日每步 +2 天）；
+    sop_assignments 為 {SOP步驟: 負責人}，「（未指定）」視為空白，task_ids 依 SOP_STEPS 順序"""
+    start = pd.Timestamp(start_date)
+    rows  = []
+    for i, step in enumerate(SOP_STEPS):
+        owner = sop_assignments.get(step, "（未指定）")
+        if owner == "（未指定）":
+            owner = ""
+        rows.append({
+            "任務ID":    task_ids[i],
+            "活動名稱":  campaign_name,
+            "SOP步驟":   step,
+            "任務說明":  "",
+            "負責人":    owner,
+            "審核狀態":  "待執行",
+            "預計完成日": (start + pd.Timedelta(days=i*2)).strftime("%Y-%m-%d"),
+            "實際完成日": "",
+            "備註":      "",
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,303 @@
+"""儲存後端：所有工作表的讀寫都經過這一層。
+
+- GSheetsBackend：正式環境，透過 st.connection("gsheets") 存取 Google Sheets
+- SQLiteBackend ：本機替身，每個工作表對應一張資料表，可離線開發、測試與壓測
+
+以環境變數 MARKETING_STORAGE 選擇後端，例如 ``gsheets`` 或 ``sqlite:///data/local.db``。
+"""
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import date, datetime
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+
+WORKSHEETS = ("Marketing_Schedule", "Campaign_Tasks", "Team_Members")
+# 冷資料的封存工作表（見 archive.py），平常不載入
+ARCHIVE_WORKSHEETS = {"Marketing_Schedule": "Marketing_Schedule_Archive",
+                      "Campaign_Tasks":     "Campaign_Tasks_Archive"}
+
+
+def _keys(key):
+    return [key] if isinstance(key, str) else list(key)
+
+
+def _key_index(frame, keys):
+    """鍵值欄位（去除前後空白的字串）組成的 Index，多個鍵為 MultiIndex"""
+    vals = [frame[k].astype(str).str.strip() for k in keys]
+    return pd.Index(vals[0]) if len(vals) == 1 else pd.MultiIndex.from_arrays(vals)
+
+
+def patch_frame(frame, key, rows):
+    """以 rows 的鍵值對應 frame 中的列並覆寫 rows 帶有的欄位，回傳新的 DataFrame（frame 不變）。
+    rows 中同一鍵值出現多次時以最後一筆為準；frame 中同鍵值的列全部覆寫"""
+    keys = _keys(key)
+    out  = frame.copy()
+    for col in rows.columns:
+        if col not in out.columns:
+            out[col] = np.nan
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            new = [v for v in rows[col].dropna().unique() if v not in set(out[col].cat.categories)]
+            out[col] = out[col].cat.add_categories(new)
+        elif out[col].dtype.kind == "f":   # 整欄空白讀回來是 float，先轉 object 才能放文字
+            out[col] = out[col].astype(object)
+    rkey = _key_index(rows, keys)
+    last = ~rkey.duplicated(keep="last")
+    rows = rows[last]
+    src  = rkey[last].get_indexer(_key_index(out, keys))   # frame 每一列對應 rows 的位置，-1 為不變
+    hit  = np.flatnonzero(src >= 0)
+    if len(hit):
+        for col in rows.columns:
+            if col not in keys:
+                out.iloc[hit, out.columns.get_loc(col)] = rows[col].to_numpy(dtype=object)[src[hit]]
+    return out
+
+
+class StorageBackend:
+    """後端介面。rows / data 一律為 DataFrame，欄位名稱即工作表表頭。"""
+
+    def read_worksheet(self, worksheet, ttl=None):
+        """讀取整張工作表（已去除全空白列）；ttl=0 代表略過快取"""
+        raise NotImplementedError
+
+    def append_rows(self, worksheet, rows):
+        """在工作表尾端新增列"""
+        raise NotImplementedError
+
+    def update_rows(self, worksheet, key, rows):
+        """依 key 欄位（字串或欄位清單）找到對應列，覆寫 rows 中的其餘欄位"""
+        raise NotImplementedError
+
+    def replace_worksheet(self, worksheet, data):
+        """整張工作表覆寫"""
+        raise NotImplementedError
+
+    def write_reads(self, op, worksheet, key=None):
+        """op（"append" / "update" / "replace"）除了寫入本身，還會送出幾次讀取 API 呼叫（查表頭、鍵值欄位等）；
+        限速時算進讀取配額。不走 API 的後端為 0"""
+        return 0
+
+    def snapshot(self, worksheets=WORKSHEETS + tuple(ARCHIVE_WORKSHEETS.values())):
+        """一次取出多張工作表的最新內容：{工作表名稱: DataFrame}，不存在的工作表略過"""
+        frames = {}
+        for ws in worksheets:
+            try:
+                frames[ws] = self.read_worksheet(ws, ttl=0)
+            except Exception:
+                continue
+        return frames
+
+    def restore(self, frames):
+        """把 snapshot() 的結果整批寫入此後端，例如把雲端資料複製到本機 SQLite"""
+        for ws, data in frames.items():
+            self.replace_worksheet(ws, data)
+
+
+# ─────────────────────────────────────────
+# Google Sheets
+# ─────────────────────────────────────────
+def _sheet_cell(v):
+    """寫入試算表的儲存格值；空值寫成空字串"""
+    if v is None or (isinstance(v, float) and np.isnan(v)) or v is pd.NaT:
+        return ""
+    if isinstance(v, (pd.Timestamp, datetime, date)):
+        return v.strftime("%Y-%m-%d")
+    return v.item() if isinstance(v, np.generic) else v
+
+
+class GSheetsBackend(StorageBackend):
+    """新增只 append 新列、更新只改動到的儲存格；表頭與資料欄位不符時才整張重寫"""
+
+    def __init__(self, name="gsheets"):
+        self.name    = name
+        self._book   = None   # gspread Spreadsheet，第一次寫入時開啟
+        self._sheets = {}     # {工作表名稱: gspread Worksheet}，每張表只查一次中繼資料
+        self._lock   = threading.Lock()
+
+    @property
+    def conn(self):
+        # st.connection 本身已由 Streamlit 快取，這裡延遲到第一次使用才匯入
+        import streamlit as st
+        from streamlit_gsheets import GSheetsConnection
+        return st.connection(self.name, type=GSheetsConnection)
+
+    def read_worksheet(self, worksheet, ttl=None):
+        kwargs = {} if ttl is None else {"ttl": ttl}
+        return self.conn.read(worksheet=worksheet, **kwargs).dropna(how="all")
+
+    def _spreadsheet(self):
+        # 以 secrets 的 [connections.<name>] 服務帳戶設定開啟試算表；只有服務帳戶連線才能寫入
+        if self._book is None:
+            import gspread
+            import streamlit as st
+
+            cfg    = dict(st.secrets["connections"][self.name])
+            target = cfg.pop("spreadsheet")
+            folder = cfg.pop("worksheet", None)
+            client = gspread.service_account_from_dict(cfg)
+            self._book = client.open_by_url(target) if target.startswith("https://") else \
+                client.open(target, folder_id=folder)
+        return self._book
+
+    def _worksheet(self, worksheet):
+        with self._lock:
+            if worksheet not in self._sheets:
+                self._sheets[worksheet] = self._spreadsheet().worksheet(worksheet)
+            return self._sheets[worksheet]
+
+    def write_reads(self, op, worksheet, key=None):
+        # 開啟試算表與查工作表各只一次；append 讀表頭，update 另外讀每個鍵值欄位
+        first = (self._book is None) + (worksheet not in self._sheets)
+        return first + (1 + len(_keys(key)) if op == "update" else int(op == "append"))
+
+    def _header(self, ws, rows):
+        """目前表頭；rows 有表頭沒有的欄位（schema 變動）時回傳 None"""
+        header = ws.row_values(1)
+        return header if header and set(rows.columns) <= set(header) else None
+
+    def append_rows(self, worksheet, rows):
+        from gspread.exceptions import WorksheetNotFound
+
+        if rows.empty:
+            return
+        try:
+            ws = self._worksheet(worksheet)
+        except WorksheetNotFound:   # 例如第一次封存：建立新工作表
+            self.conn.create(worksheet=worksheet, data=rows)
+            return
+        header = self._header(ws, rows)
+        if header is None:
+            cur = self.read_worksheet(worksheet, ttl=0)
+            self.replace_worksheet(worksheet, pd.concat([cur, rows], ignore_index=True))
+            return
+        values = [[_sheet_cell(r.get(c)) for c in header] for r in rows.to_dict("records")]
+        ws.append_rows(values, value_input_option="USER_ENTERED", table_range="A1")
+
+    def update_rows(self, worksheet, key, rows):
+        from gspread.utils import rowcol_to_a1
+
+        keys = _keys(key)
+        if rows.empty:
+            return
+        ws     = self._worksheet(worksheet)
+        header = self._header(ws, rows)
+        if header is None:
+            cur = self.read_worksheet(worksheet, ttl=0)
+            self.replace_worksheet(worksheet, patch_frame(cur, key, rows))
+            return
+
+        # 只讀鍵值欄位，找出每個鍵值所在的列號（第 1 列為表頭）
+        col_no  = {c: header.index(c) + 1 for c in header}
+        key_col = [ws.col_values(col_no[k])[1:] for k in keys]
+        row_of  = {}
+        for i, vals in enumerate(zip_longest(*key_col, fillvalue="")):
+            row_of.setdefault(tuple(str(v).strip() for v in vals), []).append(i + 2)
+
+        cells = []
+        for r in rows.to_dict("records"):
+            for row_no in row_of.get(tuple(str(r[k]).strip() for k in keys), []):
+                cells += [{"range": rowcol_to_a1(row_no, col_no[c]), "values": [[_sheet_cell(v)]]}
+                          for c, v in r.items() if c not in keys]
+        if cells:
+            ws.batch_update(cells, value_input_option="USER_ENTERED")
+
+    def replace_worksheet(self, worksheet, data):
+        # 傳入已開啟的試算表與工作表，連線層不必再查一次中繼資料
+        ws = self._worksheet(worksheet)
+        self.conn.update(spreadsheet=self._book, worksheet=ws, data=data)
+
+
+# ─────────────────────────────────────────
+# 本機 SQLite
+# ─────────────────────────────────────────
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_cell(v):
+    """轉成試算表儲存格的文字；空值存成 NULL"""
+    if v is None or (isinstance(v, float) and np.isnan(v)) or v is pd.NaT:
+        return None
+    if isinstance(v, (pd.Timestamp, datetime, date)):
+        return v.strftime("%Y-%m-%d")
+    s = str(v)
+    return s if s != "" else None
+
+
+class SQLiteBackend(StorageBackend):
+    """每張工作表存成一張全 TEXT 欄位的資料表，列順序以 rowid 保留"""
+
+    def __init__(self, path):
+        self.path  = path
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30))
+
+    def _columns(self, con, worksheet):
+        return [r[1] for r in con.execute(f"PRAGMA table_info({_quote(worksheet)})")]
+
+    def _ensure_table(self, con, worksheet, columns):
+        existing = self._columns(con, worksheet)
+        if not existing:
+            cols = ", ".join(f"{_quote(c)} TEXT" for c in columns)
+            con.execute(f"CREATE TABLE {_quote(worksheet)} ({cols})")
+            return
+        for c in columns:
+            if c not in existing:
+                con.execute(f"ALTER TABLE {_quote(worksheet)} ADD COLUMN {_quote(c)} TEXT")
+
+    def _insert(self, con, worksheet, rows):
+        if rows.empty:
+            return
+        cols   = list(rows.columns)
+        sql    = (f"INSERT INTO {_quote(worksheet)} ({', '.join(_quote(c) for c in cols)}) "
+                  f"VALUES ({', '.join('?' for _ in cols)})")
+        values = [[_to_cell(v) for v in rec] for rec in rows.itertuples(index=False, name=None)]
+        con.executemany(sql, values)
+
+    def read_worksheet(self, worksheet, ttl=None):
+        with self._connect() as con:
+            if not self._columns(con, worksheet):
+                raise KeyError(f"找不到工作表：{worksheet}")
+            df = pd.read_sql_query(f"SELECT * FROM {_quote(worksheet)} ORDER BY rowid", con)
+        # 與 Google Sheets 讀回的結果一致：空儲存格為 NaN
+        return df.where(df.notna(), np.nan).dropna(how="all")
+
+    def append_rows(self, worksheet, rows):
+        with self._lock, self._connect() as con, con:
+            self._ensure_table(con, worksheet, rows.columns)
+            self._insert(con, worksheet, rows)
+
+    def update_rows(self, worksheet, key, rows):
+        keys = _keys(key)
+        cols = [c for c in rows.columns if c not in keys]
+        if not cols:
+            return
+        sql = (f"UPDATE {_quote(worksheet)} SET {', '.join(f'{_quote(c)}=?' for c in cols)} "
+               f"WHERE {' AND '.join(f'TRIM({_quote(k)})=?' for k in keys)}")
+        with self._lock, self._connect() as con, con:
+            self._ensure_table(con, worksheet, rows.columns)
+            con.executemany(sql, [[_to_cell(r[c]) for c in cols] + [str(r[k]).strip() for k in keys]
+                                  for _, r in rows.iterrows()])
+
+    def replace_worksheet(self, worksheet, data):
+        with self._lock, self._connect() as con, con:
+            con.execute(f"DROP TABLE IF EXISTS {_quote(worksheet)}")
+            self._ensure_table(con, worksheet, data.columns)
+            self._insert(con, worksheet, data)
+
+
+def make_storage(spec="gsheets"):
+    """依設定字串建立後端：``gsheets`` 或 ``sqlite:///路徑``"""
+    if spec.startswith("sqlite:"):
+        path = spec[len("sqlite:"):].removeprefix("///")
+        if not path:
+            raise ValueError("sqlite 後端需要資料庫檔案路徑，例如 sqlite:///data/local.db")
+        return SQLiteBackend(path)
+    if spec == "gsheets" or spec.startswith("gsheets:"):
+        name = spec.partition(":")[2] or "gsheets"
+        return GSheetsBackend(name)
+    raise ValueError(f"不支援的儲存後端：{spec}")
@@ -0,0 +1,47 @@
+"""成員任務負載：每個資料版本以一次分組彙總算出，成員管理頁與新增活動表單共用"""
+import pandas as pd
+
+from .constants import SOP_STEPS, STATUS_DONE, TASK_STATUSES
+
+
+class Workload:
+    """summary   : 以負責人為索引的 DataFrame，欄位為 待完成、逾期 與各審核狀態的筆數
+    tasks_of(名): 該成員未完成的任務
+
+    逾期 = 尚未完成（審核狀態不在 STATUS_DONE）、預計完成日早於 today 且沒有實際完成日。
+    """
+
+    def __init__(self, tasks_df, today):
+        cols = ["待完成", "逾期"] + TASK_STATUSES
+        if tasks_df.empty:
+            self.summary, self.open_tasks, self._rows = pd.DataFrame(columns=cols, dtype=int), tasks_df, {}
+            return
+        owner   = tasks_df["負責人"]
+        is_open = ~tasks_df["審核狀態"].isin(STATUS_DONE)
+        overdue = is_open & tasks_df["預計完成日"].lt(today) & tasks_df["實際完成日"].isna()
+        by_status = (tasks_df.groupby([owner, tasks_df["審核狀態"]], observed=True).size()
+                     .unstack(fill_value=0).reindex(columns=TASK_STATUSES, fill_value=0))
+        counts = pd.DataFrame({"待完成": is_open, "逾期": overdue}).groupby(owner, observed=True).sum()
+        self.summary    = counts.join(by_status).fillna(0).astype(int)[cols]
+        self.open_tasks = tasks_df[is_open]
+        self._rows      = self.open_tasks.groupby("負責人", observed=True, sort=False).indices
+
+    def get(self, name, col):
+        return int(self.summary.at[name, col]) if name in self.summary.index else 0
+
+    def tasks_of(self, name):
+        rows = self._rows.get(name)
+        return self.open_tasks.iloc[rows] if rows is not None else self.open_tasks.iloc[:0]
+
+
+def default_owners(members_df):
+    """{SOP步驟: 預設負責人}：負責範疇包含該步驟的第一位成員"""
+    owners = {}
+    if members_df.empty:
+        return owners
+    scope = members_df["負責範疇"].astype(str)
+    for step in SOP_STEPS:
+        hit = members_df["姓名"][scope.str.contains(step, regex=False)]
+        if len(hit):
+            owners[step] = hit.iloc[0]
+    return owners
@@ -0,0 +1,204 @@
+"""延遲寫入佇列：所有 session 的更新先排隊，同一列的多次修改合併，每隔一小段時間整批送出"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from .storage import _keys, patch_frame
+
+log = logging.getLogger(__name__)
+
+
+def _same(a, b):
+    return (pd.isna(a) and pd.isna(b)) if (pd.isna(a) or pd.isna(b)) else str(a) == str(b)
+
+
+class WriteQueue:
+    """程序內共用的寫入佇列。
+
+    update() 只把變更放進佇列就回傳，畫面由呼叫端先行套用（樂觀更新）；背景執行緒每 interval 秒
+    把累積的變更依工作表與欄位組合成一批呼叫 store.update_rows。同一列在送出前被改了多次時只送最後的值。
+
+    衝突檢查：呼叫端可附上 base（使用者修改前看到的值）。送出前與「伺服器端目前的值」比對——
+    也就是 server(工作表) 回傳的最近一次讀取結果，加上本佇列在那之後已寫入的值；
+    若既不等於 base 也不等於新值，代表別人已改過，該欄不寫入並記錄在 conflicts。
+
+    server     : 函式(工作表) → (最近一次讀取的 DataFrame, 讀取時間)，不給則不檢查衝突
+    on_flushed : 函式(工作表)，該表一批寫入成功後呼叫
+    on_conflict: 函式(衝突 dict)，放棄寫入某一欄時呼叫（例如把畫面上的值改回伺服器的值）
+    """
+
+    def __init__(self, store, interval=0.3, retry=5, server=None, on_flushed=None, on_conflict=None):
+        self.store       = store
+        self.interval    = interval
+        self.retry       = retry
+        self.server      = server
+        self.on_flushed  = on_flushed
+        self.on_conflict = on_conflict
+        self.conflicts   = deque(maxlen=200)
+        self.last_error  = None
+        self._updates    = {}   # {(工作表, 鍵欄位): {鍵值: {"values", "base", "owner"}}}
+        self._inflight   = {}   # flush() 正在送出的批次，結構同 _updates
+        self._written    = {}   # {(工作表, 鍵欄位, 鍵值, 欄位): (值, 寫入時間)}
+        self._lock       = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty      = threading.Event()
+        self._thread     = None
+
+    def update(self, worksheet, key, row, base=None, owner=None):
+        """排入一列更新。row 含鍵值欄位與要改的欄位；base 為 {欄位: 修改前看到的值}"""
+        keys    = tuple(_keys(key))
+        kv      = tuple(str(row[k]).strip() for k in keys)
+        changes = {c: v for c, v in row.items() if c not in keys}
+        with self._lock:
+            entries = self._updates.setdefault((worksheet, keys), {})
+            if kv in entries:
+                entries[kv]["values"].update(changes)
+                for c, v in (base or {}).items():
+                    entries[kv]["base"].setdefault(c, v)   # 保留最早看到的值
+                entries[kv]["owner"] = owner
+            else:
+                entries[kv] = {"values": changes, "base": dict(base or {}), "owner": owner}
+        self._dirty.set()
+
+    def pending(self):
+        with self._lock:
+            return sum(len(e) for e in self._updates.values())
+
+    def overlay(self, worksheet, frame):
+        """frame 套上這張表還沒寫回後端（排隊中或正在送出）的變更，回傳新的 DataFrame；
+        給背景更新器在換上新讀到的資料前使用，失敗重試期間畫面也維持使用者改過的值"""
+        merged = {}   # {(鍵欄位, 鍵值): {欄位: 值}}，排隊中的比送出中的新
+        with self._lock:
+            for updates in (self._inflight, self._updates):
+                for (ws, keys), entries in updates.items():
+                    if ws == worksheet:
+                        for kv, e in entries.items():
+                            merged.setdefault((keys, kv), {}).update(e["values"])
+        groups = {}
+        for (keys, kv), values in merged.items():
+            if values:
+                groups.setdefault((keys, tuple(sorted(values))), []).append({**dict(zip(keys, kv)), **values})
+        for (keys, _), rows in groups.items():
+            frame = patch_frame(frame, list(keys), pd.DataFrame(rows))
+        return frame
+
+    def take_conflicts(self, owner):
+        """取出（並移除）屬於 owner 的衝突紀錄"""
+        with self._lock:
+            mine = [c for c in self.conflicts if c["owner"] == owner]
+            for c in mine:
+                self.conflicts.remove(c)
+        return mine
+
+    def flush(self):
+        """立即送出目前佇列中的所有變更；失敗的批次放回佇列，回傳是否全部成功"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._updates = self._updates, {}
+                self._inflight = batch
+            ok = True
+            for (ws, keys), entries in batch.items():
+                try:
+                    self._flush_updates(ws, keys, entries)
+                except Exception as e:
+                    log.exception("寫入 %s 失敗，稍後重試", ws)
+                    self.last_error = e
+                    # 送出中的這一批已去掉衝突欄位（見 _check_conflicts），放回佇列的是它
+                    self._requeue(ws, keys, self._inflight.get((ws, keys), entries))
+                    ok = False
+            with self._lock:
+                self._inflight = {}
+            if ok:
+                self.last_error = None
+            return ok
+
+    def _server_values(self, ws, keys):
+        frame, loaded_at = self.server(ws) if self.server else (None, None)
+        if frame is None:
+            return None, None, loaded_at
+        pos = {tuple(str(v).strip() for v in vals): i
+               for i, vals in enumerate(zip(*(frame[k] for k in keys)))}
+        return frame, pos, loaded_at
+
+    def _check_conflicts(self, ws, keys, entries):
+        """回傳去掉衝突欄位後的新 entries（不修改傳入的 dict），並以它取代 _inflight 中的這一批，
+        之後 overlay() 與失敗重排都不會再用到被放棄的值"""
+        frame, pos, loaded_at = self._server_values(ws, keys)
+        conflicts = []
+        for kv, e in entries.items():
+            for col, seen in e["base"].items():
+                if col not in e["values"]:
+                    continue
+                written = self._written.get((ws, keys, kv, col))
+                if written and (loaded_at is None or written[1] > loaded_at):
+                    current = written[0]
+                elif frame is not None and kv in pos and col in frame.columns:
+                    current = frame[col].iloc[pos[kv]]
+                else:
+                    continue
+                mine = e["values"][col]
+                if _same(current, seen) or _same(current, mine):
+                    continue
+                conflicts.append({"worksheet": ws, "key": dict(zip(keys, kv)), "column": col, "base": seen,
+                                  "server": current, "mine": mine, "owner": e["owner"], "at": datetime.now()})
+        rejected = {(tuple(c["key"].values()), c["column"]) for c in conflicts}
+        kept = {}
+        for kv, e in entries.items():
+            values = {c: v for c, v in e["values"].items() if (kv, c) not in rejected}
+            if values:
+                kept[kv] = {**e, "values": values}
+        with self._lock:
+            if (ws, keys) in self._inflight:
+                self._inflight = {**self._inflight, (ws, keys): kept}
+            self.conflicts.extend(conflicts)
+        if self.on_conflict:
+            for conflict in conflicts:
+                self.on_conflict(conflict)
+        return kept
+
+    def _flush_updates(self, ws, keys, entries):
+        entries = self._check_conflicts(ws, keys, entries)
+        groups  = {}   # 依要改的欄位組合分批，避免把沒要改的欄位寫成空白
+        for kv, e in entries.items():
+            groups.setdefault(tuple(sorted(e["values"])), []).append({**dict(zip(keys, kv)), **e["values"]})
+        for rows in groups.values():
+            self.store.update_rows(ws, list(keys), pd.DataFrame(rows))
+        now = datetime.now()
+        for kv, e in entries.items():
+            for col, v in e["values"].items():
+                self._written[(ws, keys, kv, col)] = (v, now)
+        # 已經被之後的讀取涵蓋的寫入紀錄不再需要
+        loaded_at = self.server(ws)[1] if self.server else None
+        if loaded_at:
+            self._written = {k: v for k, v in self._written.items() if k[0] != ws or v[1] > loaded_at}
+        if entries and self.on_flushed:
+            self.on_flushed(ws)
+
+    def _requeue(self, ws, keys, entries):
+        with self._lock:
+            current = self._updates.setdefault((ws, keys), {})
+            for kv, e in entries.items():
+                if kv in current:   # 失敗期間又有新的修改：新值優先，base 保留較早的
+                    current[kv] = {"values": {**e["values"], **current[kv]["values"]},
+                                   "base": {**current[kv]["base"], **e["base"]}, "owner": current[kv]["owner"]}
+                else:
+                    current[kv] = e
+        self._dirty.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.interval)   # 收集這段時間內其他 session 的修改一起送出
+            self._dirty.clear()
+            if not self.flush():
+                time.sleep(self.retry)